@@ -0,0 +1,252 @@
+"""
+Benchmarks of the NWP importers on synthetic files.
+
+The benchmarks are run with asv (https://asv.readthedocs.io), which stores
+the results per commit in ``.asv/results`` so that they can be compared
+between versions, e.g.::
+
+    asv run --python=same --quick
+    asv continuous main HEAD
+    asv compare main HEAD
+
+Each importer is run on synthetic files of several grid and lead-time sizes
+in the following modes:
+
+- eager: the whole file is imported into a numpy array,
+- lazy: the file is imported as a dask array, which is then computed,
+- subset: a quarter of the grid and half of the lead times are imported,
+- iter: the lead times are read one at a time with the iter_*_nwp functions.
+
+The BoM files contain accumulated precipitation, so that the BoM benchmarks
+cover the disaggregation. The files are reopened at each import, so that the
+cost of opening the file and parsing its header is included.
+
+The opening of files with many other variables, like the operational files,
+is compared between opening all the variables and opening only the variables
+used by the importers.
+
+The files with precipitation packed in 16-bit integers are imported unpacked
+to float32, and kept packed with ``packed=True``.
+"""
+
+import math
+import os
+import tracemalloc
+
+from pysteps_nwp_importers.dataset_pool import DatasetPool
+from pysteps_nwp_importers.importer_bom_nwp import (
+    import_bom_nwp,
+    import_bom_nwp_metadata,
+    iter_bom_nwp,
+)
+from pysteps_nwp_importers.importer_knmi_nwp import (
+    import_knmi_nwp,
+    import_knmi_nwp_metadata,
+    iter_knmi_nwp,
+)
+from pysteps_nwp_importers.importer_rmi_nwp import (
+    import_rmi_nwp,
+    import_rmi_nwp_metadata,
+    iter_rmi_nwp,
+)
+from pysteps_nwp_importers.tests.synthetic_data import write_synthetic_nwp_file
+
+IMPORTERS = dict(
+    knmi=(import_knmi_nwp, import_knmi_nwp_metadata, iter_knmi_nwp),
+    bom=(import_bom_nwp, import_bom_nwp_metadata, iter_bom_nwp),
+    rmi=(import_rmi_nwp, import_rmi_nwp_metadata, iter_rmi_nwp),
+)
+
+# lead times, rows and columns of the synthetic files
+SIZES = {
+    "12x100x100": (12, 100, 100),
+    "48x500x500": (48, 500, 500),
+    "48x1000x1000": (48, 1000, 1000),
+}
+
+MODES = ["eager", "lazy", "subset", "iter"]
+
+
+def _import(filename, layout, mode):
+    importer, metadata_importer, iter_importer = IMPORTERS[layout]
+    # a pool without open datasets, to include the opening of the file
+    pool = DatasetPool(maxsize=0)
+
+    if mode == "eager":
+        importer(filename, pool=pool)
+    elif mode == "lazy":
+        # the pool closes the lazily opened dataset once it is computed
+        with DatasetPool(maxsize=1) as lazy_pool:
+            importer(filename, pool=lazy_pool, lazy=True)[0].compute()
+    elif mode == "subset":
+        metadata = metadata_importer(filename, pool=pool)
+        x1, x2, y1, y2 = (metadata[key] for key in ("x1", "x2", "y1", "y2"))
+        time_stamps = metadata["time_stamps"]
+        importer(
+            filename,
+            pool=pool,
+            bbox=(x1, y1, x1 + (x2 - x1) / 2, y1 + (y2 - y1) / 2),
+            start_time=time_stamps[len(time_stamps) // 4],
+            end_time=time_stamps[3 * len(time_stamps) // 4],
+        )
+    elif mode == "iter":
+        for _ in iter_importer(filename, pool=pool):
+            pass
+    else:
+        raise ValueError(f"unknown mode {mode}")
+
+
+def _bytes_read():
+    """Number of bytes read by the process, including from the page cache.
+
+    NaN if /proc/self/io is not available, e.g. outside Linux.
+    """
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return float("nan")
+
+
+class ImportSuite:
+    params = (list(IMPORTERS), list(SIZES), MODES)
+    param_names = ["layout", "size", "mode"]
+    timeout = 600
+
+    def setup_cache(self):
+        filenames = {}
+        for layout in IMPORTERS:
+            for size, (n_leadtimes, n_rows, n_cols) in SIZES.items():
+                filenames[layout, size] = write_synthetic_nwp_file(
+                    os.path.abspath(f"{layout}_{size}.nc"),
+                    layout,
+                    complevel=4,
+                    n_leadtimes=n_leadtimes,
+                    n_rows=n_rows,
+                    n_cols=n_cols,
+                )
+        return filenames
+
+    def time_import(self, filenames, layout, size, mode):
+        _import(filenames[layout, size], layout, mode)
+
+    def peakmem_import(self, filenames, layout, size, mode):
+        _import(filenames[layout, size], layout, mode)
+
+    def track_tracemalloc_peak(self, filenames, layout, size, mode):
+        tracemalloc.start()
+        try:
+            _import(filenames[layout, size], layout, mode)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    track_tracemalloc_peak.unit = "bytes"
+
+    def track_bytes_read(self, filenames, layout, size, mode):
+        start = _bytes_read()
+        if math.isnan(start):
+            return start
+        _import(filenames[layout, size], layout, mode)
+        return _bytes_read() - start
+
+    track_bytes_read.unit = "bytes"
+
+
+# variables used by the importers, see _import_*_nwp_data_xr
+USED_VARIABLES = dict(
+    knmi=("P_fc", "time", "crs"),
+    bom=("accum_prcp", "time", "proj"),
+    rmi=("precipitation", "time"),
+)
+
+
+def _write_files_with_variables(n_extra_variables_list):
+    """Write the files with extra variables not used by the importers."""
+    filenames = {}
+    for layout in IMPORTERS:
+        for n_extra_variables in n_extra_variables_list:
+            filenames[layout, n_extra_variables] = write_synthetic_nwp_file(
+                os.path.abspath(f"{layout}_{n_extra_variables}_variables.nc"),
+                layout,
+                complevel=4,
+                n_leadtimes=12,
+                n_rows=100,
+                n_cols=100,
+                n_extra_variables=n_extra_variables,
+            )
+    return filenames
+
+
+class OpenSuite:
+    params = (list(IMPORTERS), [0, 50], ["all", "used"])
+    param_names = ["layout", "n_extra_variables", "variables"]
+    timeout = 600
+
+    def setup_cache(self):
+        return _write_files_with_variables(self.params[1])
+
+    def time_open(self, filenames, layout, n_extra_variables, variables):
+        pool = DatasetPool(maxsize=0)
+        ds = pool.open(
+            filenames[layout, n_extra_variables],
+            variables=USED_VARIABLES[layout] if variables == "used" else None,
+        )
+        pool.release(ds)
+
+
+class OpenMetadataSuite:
+    # the importers only open the used variables
+    params = (list(IMPORTERS), [0, 50])
+    param_names = ["layout", "n_extra_variables"]
+    timeout = 600
+
+    def setup_cache(self):
+        return _write_files_with_variables(self.params[1])
+
+    def time_import_metadata(self, filenames, layout, n_extra_variables):
+        IMPORTERS[layout][1](
+            filenames[layout, n_extra_variables], pool=DatasetPool(maxsize=0)
+        )
+
+
+class PackedSuite:
+    params = (list(IMPORTERS), ["unpacked", "packed"])
+    param_names = ["layout", "decoding"]
+    timeout = 600
+
+    def setup_cache(self):
+        filenames = {}
+        for layout in IMPORTERS:
+            filenames[layout] = write_synthetic_nwp_file(
+                os.path.abspath(f"{layout}_packed.nc"),
+                layout,
+                complevel=4,
+                packed=True,
+                n_leadtimes=48,
+                n_rows=500,
+                n_cols=500,
+            )
+        return filenames
+
+    def _import(self, filenames, layout, decoding):
+        return IMPORTERS[layout][0](
+            filenames[layout],
+            pool=DatasetPool(maxsize=0),
+            packed=decoding == "packed",
+        )
+
+    def time_import(self, filenames, layout, decoding):
+        self._import(filenames, layout, decoding)
+
+    def peakmem_import(self, filenames, layout, decoding):
+        self._import(filenames, layout, decoding)
+
+    def track_nbytes(self, filenames, layout, decoding):
+        return self._import(filenames, layout, decoding)[0].nbytes
+
+    track_nbytes.unit = "bytes"
@@ -1,5 +1,22 @@
 """Methods to import NWP rainfall forecasts."""
 
-from pysteps_nwp_importers import importer_bom_nwp
-from pysteps_nwp_importers import importer_knmi_nwp
-from pysteps_nwp_importers import importer_rmi_nwp
+import importlib
+
+# the importer modules are imported on first access, so that importing the
+# package does not import the heavy dependencies of all the importers
+_IMPORTER_MODULES = (
+    "importer_bom_nwp",
+    "importer_knmi_nwp",
+    "importer_rmi_nwp",
+    "importer_zarr_nwp",
+)
+
+
+def __getattr__(name):
+    if name in _IMPORTER_MODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_IMPORTER_MODULES))
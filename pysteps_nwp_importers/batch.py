@@ -0,0 +1,315 @@
+"""
+pysteps_nwp_importers.batch
+====================
+
+Import several NWP forecast runs at once.
+
+The runs are written into a single array with the dimensions
+[run, time, rows, cols]. The headers of all the files are read and compared
+first, so that a run on a different grid is reported before any data is
+decoded.
+
+:py:func:`import_nwp_batch` reads the runs with a pool of threads, which is
+enough when few runs are imported. :py:func:`backfill_nwp` spreads the runs
+over a pool of processes for the reprocessing of long archives, which is
+limited by the decompression of the files. The processes write the fields
+directly into shared memory or into a memory-mapped ``.npy`` file, so that
+the fields are not sent back to the parent process.
+
+.. autosummary::
+    :toctree: ../generated/
+
+    backfill_nwp
+    import_nwp_batch
+"""
+
+import importlib
+import inspect
+import os
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pysteps_nwp_importers.dataset_pool import DatasetPool
+
+GRID_KEYS = ("projection", "x1", "x2", "y1", "y2", "xpixelsize", "ypixelsize")
+
+# directory of the files of the POSIX shared memory blocks on Linux
+SHM_DIR = "/dev/shm"
+
+
+def import_nwp_batch(importer, filenames, max_workers=None, **kwargs):
+    """Import NWP forecast runs concurrently into one stacked array.
+
+    Parameters
+    ----------
+    importer: function
+        Importer of the runs, e.g.
+        :py:func:`pysteps_nwp_importers.importer_bom_nwp.import_bom_nwp`, or
+        the same importer obtained from pysteps.
+    filenames: list of str
+        Names of the files of the runs.
+    max_workers: int, optional
+        Number of threads reading the files. Defaults to the default of
+        :py:class:`concurrent.futures.ThreadPoolExecutor`.
+    kwargs
+        Keywords passed to the importer, except lazy, chunks and out.
+
+    Returns
+    -------
+    out: tuple
+        A three-element tuple containing the precipitation of the runs
+        stacked in an array of shape [run, time, rows, cols], the quality
+        field (None) and the list of the metadata of the runs.
+
+    Raises
+    ------
+    ValueError
+        If the runs are not on the same grid or do not have the same number
+        of time steps.
+    """
+    filenames = _check_batch_arguments(filenames, kwargs)
+
+    importer = inspect.unwrap(importer)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        _check_headers(importer, filenames, executor, kwargs)
+
+        shape, dtype = _get_run_shape_and_dtype(importer, filenames[0], kwargs)
+        precipitation = np.empty((len(filenames),) + shape, dtype=dtype)
+
+        futures = [
+            executor.submit(importer, filename, out=precipitation[i], **kwargs)
+            for i, filename in enumerate(filenames)
+        ]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                for pending_future in not_done:
+                    pending_future.cancel()
+                raise future.exception()
+        metadata_list = [future.result()[2] for future in futures]
+
+    return precipitation, None, metadata_list
+
+
+def backfill_nwp(
+    importer,
+    filenames,
+    output=None,
+    n_workers=None,
+    progress=None,
+    mp_context=None,
+    **kwargs,
+):
+    """Import NWP forecast runs in a pool of processes into one stacked array.
+
+    Each process imports whole runs and writes them into a block of shared
+    memory, or into a memory-mapped output file, at the index of the run.
+    The output is thus in the order of the filenames, whatever the order in
+    which the runs are completed.
+
+    Parameters
+    ----------
+    importer: function
+        Importer of the runs, e.g.
+        :py:func:`pysteps_nwp_importers.importer_knmi_nwp.import_knmi_nwp`, or
+        the same importer obtained from pysteps.
+    filenames: list of str
+        Names of the files of the runs.
+    output: str, optional
+        Name of a ``.npy`` file in which the runs are written. If None, the
+        runs are written into shared memory. On Linux, the returned array is
+        mapped to the shared memory, which is released with the array.
+        Elsewhere, the runs are copied from shared memory into the returned
+        array once they are all imported, which briefly doubles the memory
+        used, so that output is recommended for large backfills.
+    n_workers: int, optional
+        Number of processes. Defaults to the number of processors.
+    progress: function, optional
+        Function called in the parent process with the number of imported
+        runs and the total number of runs each time a run is imported.
+    mp_context: multiprocessing.context.BaseContext, optional
+        Context used to start the processes, see
+        :py:class:`concurrent.futures.ProcessPoolExecutor`.
+    kwargs
+        Keywords passed to the importer, except lazy, chunks and out.
+
+    Returns
+    -------
+    out: tuple
+        A three-element tuple containing the precipitation of the runs
+        stacked in an array of shape [run, time, rows, cols], the quality
+        field (None) and the list of the metadata of the runs. If output is
+        given, the precipitation is a memory map of the output file, and
+        otherwise on Linux a memory map of the shared memory.
+
+    Raises
+    ------
+    ValueError
+        If the runs are not on the same grid or do not have the same number
+        of time steps.
+    """
+    filenames = _check_batch_arguments(filenames, kwargs)
+    importer = inspect.unwrap(importer)
+
+    with ThreadPoolExecutor() as executor:
+        _check_headers(importer, filenames, executor, kwargs)
+    shape, dtype = _get_run_shape_and_dtype(importer, filenames[0], kwargs)
+    shape = (len(filenames),) + shape
+
+    shm = None
+    if output is None:
+        nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        target = dict(shm_name=shm.name, shape=shape, dtype=dtype)
+    else:
+        np.lib.format.open_memmap(output, mode="w+", dtype=dtype, shape=shape).flush()
+        target = dict(output=output)
+    # the pool of open datasets cannot be shared with the processes
+    worker_kwargs = {key: value for key, value in kwargs.items() if key != "pool"}
+
+    try:
+        metadata_list = [None] * len(filenames)
+        with ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=mp_context
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _backfill_run, importer, filename, i, worker_kwargs, **target
+                ): i
+                for i, filename in enumerate(filenames)
+            }
+            try:
+                for n_done, future in enumerate(as_completed(futures), start=1):
+                    metadata_list[futures[future]] = future.result()
+                    if progress is not None:
+                        progress(n_done, len(filenames))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        if shm is None:
+            precipitation = np.load(output, mmap_mode="r+")
+        else:
+            precipitation = _map_shared_memory(shm, shape, dtype)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    return precipitation, None, metadata_list
+
+
+def _backfill_run(
+    importer,
+    filename,
+    index,
+    kwargs,
+    output=None,
+    shm_name=None,
+    shape=None,
+    dtype=None,
+):
+    """Import a run in a worker process of :py:func:`backfill_nwp`."""
+    # datasets opened by the parent process are not reused after a fork
+    kwargs = dict(kwargs, pool=DatasetPool(maxsize=0))
+
+    if output is not None:
+        precipitation = np.load(output, mmap_mode="r+")
+        _, _, metadata = importer(filename, out=precipitation[index], **kwargs)
+        precipitation.flush()
+        del precipitation
+        return metadata
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        precipitation = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _, _, metadata = importer(filename, out=precipitation[index], **kwargs)
+        del precipitation
+    finally:
+        shm.close()
+    return metadata
+
+
+def _map_shared_memory(shm, shape, dtype):
+    """Return the runs written into shared memory, without copying them if the
+    block is a file of SHM_DIR."""
+    # the file is mapped independently of the SharedMemory object, and stays
+    # mapped until the array is garbage collected once the block is unlinked
+    path = os.path.join(SHM_DIR, shm.name.lstrip("/"))
+    if int(np.prod(shape)) > 0 and os.path.isfile(path):
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+
+
+def _check_batch_arguments(filenames, kwargs):
+    if kwargs.get("lazy", False) or kwargs.get("chunks") is not None:
+        raise ValueError("lazy imports cannot be stacked in a batch")
+    if "out" in kwargs:
+        raise ValueError("the output array of a batch is allocated by the batch")
+
+    filenames = list(filenames)
+    if len(filenames) == 0:
+        raise ValueError("no file to import")
+    return filenames
+
+
+def _get_run_shape_and_dtype(importer, filename, kwargs):
+    """Return the shape and data type of the precipitation of a run."""
+    # the lazy import without the threshold, which would decode the first
+    # field, only reads the header and the coordinates. The dataset it opens
+    # is closed with its own pool.
+    with DatasetPool(maxsize=1) as pool:
+        precip, _, _ = importer(
+            filename, **dict(kwargs, lazy=True, compute_threshold=False, pool=pool)
+        )
+    return precip.shape, precip.dtype
+
+
+def _check_headers(importer, filenames, executor, kwargs):
+    """Read the headers of the runs and check that they can be stacked."""
+    metadata_importer = _get_metadata_importer(importer)
+    headers = list(
+        executor.map(lambda filename: metadata_importer(filename, **kwargs), filenames)
+    )
+    for filename, metadata in zip(filenames[1:], headers[1:]):
+        _check_same_grid(headers[0], metadata, filenames[0], filename)
+
+
+def _get_metadata_importer(importer):
+    module = importlib.import_module(importer.__module__)
+    metadata_importer = getattr(module, f"{importer.__name__}_metadata", None)
+    if metadata_importer is None:
+        raise ValueError(f"no metadata importer found for {importer.__name__}")
+    return metadata_importer
+
+
+def _check_same_grid(metadata, other_metadata, filename, other_filename):
+    for key in GRID_KEYS:
+        value, other_value = metadata[key], other_metadata[key]
+        if isinstance(value, str) or value is None:
+            same = value == other_value
+        else:
+            same = np.isclose(value, other_value)
+        if not same:
+            raise ValueError(
+                f"{other_filename} is not on the grid of {filename}: "
+                f"{key} is {other_value} instead of {value}"
+            )
+
+    n_times = len(metadata["time_stamps"])
+    other_n_times = len(other_metadata["time_stamps"])
+    if n_times != other_n_times:
+        raise ValueError(
+            f"{other_filename} has {other_n_times} time steps instead of "
+            f"{n_times} in {filename}"
+        )
@@ -0,0 +1,212 @@
+"""
+pysteps_nwp_importers.cache
+====================
+
+On-disk cache of decoded NWP forecasts.
+
+Decompressing and decoding a NWP file is the main cost of importing it. A
+:py:class:`DecodedCache` stores the precipitation returned by an importer as
+a ``.npy`` file, next to a small sidecar with the metadata, so that importing
+the same file with the same keywords again returns a memory map of the
+cached array without decoding the file. The cache is used by passing it to
+the importers with the ``cache`` keyword::
+
+    cache = DecodedCache("/tmp/nwp_cache", max_bytes=10 * 1024**3)
+    precip, _, metadata = import_bom_nwp(filename, cache=cache)
+
+An entry is identified by the importer, the path, modification time and size
+of the file and the keywords of the importer, so that a modified file is
+decoded again. The least recently used entries are removed when the size of
+the cache exceeds ``max_bytes``.
+
+.. autosummary::
+    :toctree: ../generated/
+
+    DecodedCache
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from pysteps_nwp_importers.utils import Timings
+
+# keywords not changing the imported precipitation
+IGNORED_KWARGS = (
+    "pool",
+    "prefetch",
+    "out",
+    "cache",
+    "timings_callback",
+    "weights_dir",
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DecodedCache:
+    """Cache of decoded precipitation stored as memory-mapped ``.npy`` files.
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the cache files. It is created if it does not exist.
+    max_bytes: int, optional
+        Maximum size of the cached arrays in bytes. When the cache is larger,
+        the least recently used entries are removed. If None, the size of the
+        cache is not bounded.
+    """
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def load(self, importer, filename, **kwargs):
+        """Import a file through the cache.
+
+        Parameters
+        ----------
+        importer: function
+            Importer of the file, called without the cache if the file is not
+            in the cache.
+        filename: str
+            Name of the file to import.
+        kwargs
+            Keywords of the importer.
+
+        When the file is in the cache, the timings_callback of the keywords
+        is called with the duration of the loading of the cached array as a
+        "cache_hit" stage.
+
+        Returns
+        -------
+        out: tuple
+            The output of the importer, with the precipitation as a read-only
+            memory map of the cached array. If out is given, the cached array
+            is copied to it and out is returned instead.
+        """
+        if kwargs.get("lazy", False) or kwargs.get("chunks") is not None:
+            return importer(filename, **kwargs)
+
+        key = _get_key(importer, filename, kwargs)
+        array_path, metadata_path = self._get_paths(key)
+        hit = os.path.isfile(array_path) and os.path.isfile(metadata_path)
+        if hit:
+            os.utime(array_path)
+        else:
+            self._store(key, filename, importer(filename, **kwargs))
+            self._evict(keep=key)
+
+        timings = Timings()
+        with timings.stage("cache_hit"):
+            precipitation = np.load(array_path, mmap_mode="r")
+            with open(metadata_path, "rb") as f:
+                metadata = pickle.load(f)["metadata"]
+
+            out = kwargs.get("out")
+            if out is not None:
+                out[...] = precipitation
+                precipitation = out
+
+        # on a miss, the importer reports the stages of the decoding
+        if hit:
+            timings.report(
+                logger, filename, precipitation, kwargs.get("timings_callback")
+            )
+        return precipitation, None, metadata
+
+    def invalidate(self, filename=None):
+        """Remove the cached arrays of a file, or of all the files if None."""
+        path = None if filename is None else os.path.realpath(filename)
+        for key, source, _, _ in self._entries():
+            if path is None or source == path:
+                self._remove(key)
+
+    def clear(self):
+        """Remove all the cached arrays."""
+        self.invalidate()
+
+    def size(self):
+        """Return the size of the cached arrays in bytes."""
+        return sum(nbytes for _, _, nbytes, _ in self._entries())
+
+    def _get_paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".npy", base + ".pkl"
+
+    def _store(self, key, filename, imported):
+        precipitation, _, metadata = imported
+        array_path, metadata_path = self._get_paths(key)
+        sidecar = dict(source=os.path.realpath(filename), metadata=metadata)
+
+        # the files are written under temporary names and renamed, so that
+        # concurrent readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npy.tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.asarray(precipitation))
+        os.replace(tmp_path, array_path)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".pkl.tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(sidecar, f)
+        os.replace(tmp_path, metadata_path)
+
+    def _entries(self):
+        """Return the key, source file, size and access time of the entries."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            key = name[: -len(".pkl")]
+            array_path, metadata_path = self._get_paths(key)
+            try:
+                stat = os.stat(array_path)
+                with open(metadata_path, "rb") as f:
+                    source = pickle.load(f)["source"]
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            entries.append((key, source, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def _remove(self, key):
+        for path in self._get_paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, keep=None):
+        if self.max_bytes is None:
+            return
+        entries = sorted(self._entries(), key=lambda entry: entry[3])
+        size = sum(entry[2] for entry in entries)
+        for key, _, nbytes, _ in entries:
+            if size <= self.max_bytes:
+                break
+            if key != keep:
+                self._remove(key)
+                size -= nbytes
+
+
+def _get_key(importer, filename, kwargs):
+    path = os.path.realpath(filename)
+    stat = os.stat(path)
+    kwargs_key = sorted(
+        (name, repr(value))
+        for name, value in kwargs.items()
+        if name not in IGNORED_KWARGS
+    )
+    key = (
+        importer.__module__,
+        importer.__qualname__,
+        path,
+        stat.st_mtime_ns,
+        stat.st_size,
+        kwargs_key,
+    )
+    return hashlib.sha256(repr(key).encode()).hexdigest()
@@ -0,0 +1,162 @@
+"""
+pysteps_nwp_importers.conversion
+====================
+
+Unit conversion and transformation of the imported NWP forecasts, fused with
+the decoding of the data.
+
+The importers return the precipitation accumulated over the time step of the
+file (mm). With the ``to_unit`` and ``transform`` keywords, the fields are
+converted to rain rates (mm/h) and transformed to dB or Box-Cox values in
+place, one field at a time as they are decoded, instead of in separate passes
+over the whole forecast::
+
+    precip, _, metadata = import_bom_nwp(filename, to_unit="mm/h", transform="dB")
+
+The transformations follow :py:func:`pysteps.utils.transformation.dB_transform`
+and :py:func:`pysteps.utils.transformation.boxcox_transform`: the values below
+the threshold are set to the zerovalue, and the unit, transform, threshold and
+zerovalue metadata are set to their values in the transformed space.
+
+.. autosummary::
+    :toctree: ../generated/
+
+    convert_array
+    get_converter
+"""
+
+import numpy as np
+
+UNITS = ("mm", "mm/h")
+TRANSFORMS = ("dB", "BoxCox")
+
+# threshold used by pysteps when the metadata have none, in the target unit
+DEFAULT_THRESHOLD = 0.1
+
+
+def get_converter(metadata, **kwargs):
+    """Get the function converting the precipitation fields in place, and the
+    metadata of the converted precipitation.
+
+    Parameters
+    ----------
+    metadata: dict
+        Metadata of the precipitation, as returned by the importers.
+    to_unit: {"mm", "mm/h"}, optional
+        Unit of the converted precipitation. Defaults to the unit of the
+        metadata.
+    transform: {"dB", "BoxCox"}, optional
+        Transformation of the converted precipitation. Defaults to None.
+    boxcox_lambda: float, optional
+        Parameter of the Box-Cox transformation. Defaults to 0, i.e. a log
+        transformation.
+
+    Returns
+    -------
+    convert: function or None
+        Function converting a numpy array in place and returning it, or None
+        if there is nothing to convert.
+    metadata: dict
+        Metadata of the converted precipitation.
+    """
+    to_unit = kwargs.get("to_unit")
+    transform = kwargs.get("transform")
+    boxcox_lambda = kwargs.get("boxcox_lambda", 0.0)
+    if to_unit is None and transform is None:
+        return None, metadata
+
+    if to_unit is not None and to_unit not in UNITS:
+        raise ValueError(f"unknown unit {to_unit}, expected one of {UNITS}")
+    if transform is not None and transform not in TRANSFORMS:
+        raise ValueError(f"unknown transform {transform}, expected one of {TRANSFORMS}")
+    if metadata.get("transform") is not None:
+        raise ValueError(f"the precipitation is already {metadata['transform']}")
+
+    metadata = dict(metadata)
+    factor = 1.0
+    if to_unit is not None and to_unit != metadata["unit"]:
+        if metadata["unit"] not in UNITS:
+            raise ValueError(
+                f"cannot convert precipitation in {metadata['unit']} to {to_unit}"
+            )
+        factor = 60.0 / float(metadata["accutime"])
+        if to_unit == "mm":
+            factor = 1.0 / factor
+        for key in ("zerovalue", "threshold"):
+            if metadata.get(key) is not None:
+                metadata[key] = metadata[key] * factor
+        metadata["unit"] = to_unit
+
+    if transform is None:
+
+        def convert(field):
+            field *= field.dtype.type(factor)
+            return field
+
+        return convert, metadata
+
+    threshold = metadata.get("threshold")
+    if threshold is None or not threshold > 0:
+        threshold = DEFAULT_THRESHOLD
+    if transform == "dB":
+        transformed_threshold = float(10.0 * np.log10(threshold))
+        zerovalue = transformed_threshold - 5.0
+    else:
+        transformed_threshold = float(_boxcox(threshold, boxcox_lambda))
+        zerovalue = transformed_threshold - 1.0
+    metadata.update(
+        transform=transform, threshold=transformed_threshold, zerovalue=zerovalue
+    )
+
+    def convert(field):
+        if factor != 1.0:
+            field *= field.dtype.type(factor)
+        # the NaNs are neither below the threshold nor transformed
+        zeros = field < threshold
+        rain = ~zeros
+        if transform == "dB":
+            np.log10(field, out=field, where=rain)
+            np.multiply(field, 10.0, out=field, where=rain)
+        elif boxcox_lambda == 0.0:
+            np.log(field, out=field, where=rain)
+        else:
+            np.power(field, boxcox_lambda, out=field, where=rain)
+            np.subtract(field, 1.0, out=field, where=rain)
+            np.divide(field, boxcox_lambda, out=field, where=rain)
+        np.copyto(field, zerovalue, where=zeros, casting="unsafe")
+        return field
+
+    return convert, metadata
+
+
+def convert_array(precipitation, convert):
+    """Convert precipitation fields in place, one field at a time.
+
+    Parameters
+    ----------
+    precipitation: array-like
+        Precipitation fields with the rows and columns as last two dimensions.
+        Dask arrays are converted lazily, block by block.
+    convert: function
+        Function converting a field in place, see :py:func:`get_converter`.
+
+    Returns
+    -------
+    precipitation: array-like
+        The converted precipitation, the input itself for numpy arrays.
+    """
+    if getattr(precipitation, "chunks", None) is not None:
+        # the blocks may be shared with other dask arrays
+        return precipitation.map_blocks(
+            lambda block: convert(block.copy()), dtype=precipitation.dtype
+        )
+
+    for index in np.ndindex(precipitation.shape[:-2]):
+        convert(precipitation[index])
+    return precipitation
+
+
+def _boxcox(value, boxcox_lambda):
+    if boxcox_lambda == 0.0:
+        return np.log(value)
+    return (value**boxcox_lambda - 1.0) / boxcox_lambda
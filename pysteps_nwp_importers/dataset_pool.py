@@ -0,0 +1,201 @@
+"""
+pysteps_nwp_importers.dataset_pool
+====================
+
+Pool of open datasets shared by the NWP importers.
+
+Opening a NetCDF file and parsing its header is a significant part of the
+cost of importing a NWP forecast. The importers open their files through a
+:py:class:`DatasetPool`, which keeps the most recently used datasets open so
+that importing the same file again does not reopen it. A file is identified
+by its path, modification time and size, so a file that is overwritten is
+opened again.
+
+By default, the importers use a module-level pool that can be emptied with
+:py:func:`close_all`. A different pool can be passed to the importers with the
+``pool`` keyword, e.g. to bound the life time of the open files::
+
+    with DatasetPool(maxsize=4) as pool:
+        precip, _, metadata = import_bom_nwp(filename, pool=pool)
+
+The importers only open the variables they use: the precipitation, the
+coordinates of its dimensions and the projection. The other variables of the
+file are dropped before xarray decodes them, so that the CF decoding, e.g.
+the masking and scaling, is only applied to the used variables.
+
+.. autosummary::
+    :toctree: ../generated/
+
+    DatasetPool
+    close_all
+    get_pool
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+class DatasetPool:
+    """Least recently used pool of open xarray datasets.
+
+    Parameters
+    ----------
+    maxsize: int
+        Maximum number of datasets kept open. When the pool is full, the least
+        recently used dataset is closed. If 0, no dataset is kept open.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._datasets = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close_all()
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        if maxsize < 0:
+            raise ValueError(f"maxsize must be positive or zero, got {maxsize}")
+        self._maxsize = maxsize
+        if hasattr(self, "_datasets"):
+            with self._lock:
+                self._evict()
+
+    def open(self, filename, variables=None, **kwargs):
+        """Open a dataset, or return it from the pool if it is already open.
+
+        The returned dataset is shared with the other users of the pool and
+        must not be modified in place.
+
+        Parameters
+        ----------
+        filename: str
+            Name of the file to open.
+        variables: list of str, optional
+            Names of the variables to open. The coordinates of their dimensions
+            and their grid mappings are also opened, and the other variables
+            of the file are dropped without being decoded. Defaults to all the
+            variables.
+        kwargs
+            Keywords passed to :py:func:`xarray.open_dataset`. The same file
+            opened with different keywords is kept as a different dataset.
+
+        Returns
+        -------
+        ds: xarray.Dataset
+            The open dataset. Datasets not kept in the pool should be closed
+            with :py:meth:`release`.
+        """
+        path, key = _get_key(filename, dict(kwargs, variables=variables))
+        with self._lock:
+            if key in self._datasets:
+                self._datasets.move_to_end(key)
+                return self._datasets[key]
+
+        # imported here to keep the import of the importers fast
+        import xarray as xr
+
+        if variables is None:
+            ds = xr.open_dataset(filename, **kwargs)
+        else:
+            # the header is parsed once, to find the variables to drop and to
+            # open the dataset, under the lock of xarray as HDF5 is not thread
+            # safe
+            store = xr.backends.NetCDF4DataStore.open(filename)
+            try:
+                nc = store.ds
+                with store.lock:
+                    drop_variables = _get_drop_variables(nc, variables)
+                ds = xr.open_dataset(store, drop_variables=drop_variables, **kwargs)
+            except BaseException:
+                store.close()
+                raise
+
+        with self._lock:
+            if self.maxsize == 0:
+                return ds
+            if key in self._datasets:
+                # opened concurrently by another thread
+                ds.close()
+                self._datasets.move_to_end(key)
+                return self._datasets[key]
+
+            # an older version of the same file is stale, the same version
+            # opened with other keywords is kept
+            for other_key in list(self._datasets):
+                if other_key[0] == path and other_key[1:3] != key[1:3]:
+                    self._datasets.pop(other_key).close()
+
+            self._datasets[key] = ds
+            self._evict()
+        return ds
+
+    def release(self, ds):
+        """Close a dataset returned by :py:meth:`open`, unless it is kept open
+        in the pool."""
+        with self._lock:
+            if any(ds is pooled_ds for pooled_ds in self._datasets.values()):
+                return
+        ds.close()
+
+    def close_all(self):
+        """Close all the datasets kept in the pool."""
+        with self._lock:
+            while self._datasets:
+                _, ds = self._datasets.popitem(last=False)
+                ds.close()
+
+    def _evict(self):
+        while len(self._datasets) > self.maxsize:
+            _, ds = self._datasets.popitem(last=False)
+            ds.close()
+
+
+def _get_key(filename, kwargs):
+    path = os.path.realpath(filename)
+    stat = os.stat(path)
+    kwargs_key = tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+    return path, (path, stat.st_mtime_ns, stat.st_size, kwargs_key)
+
+
+def _get_drop_variables(nc, variables):
+    """Return the names of the variables of an open netCDF4 dataset not needed
+    to read the given variables."""
+    needed = set()
+    for name in variables:
+        if name not in nc.variables:
+            continue
+        variable = nc.variables[name]
+        needed.add(name)
+        needed.update(variable.dimensions)
+        grid_mapping = getattr(variable, "grid_mapping", None)
+        if grid_mapping is not None:
+            needed.update(grid_mapping.split())
+    return [name for name in nc.variables if name not in needed]
+
+
+_default_pool = DatasetPool()
+
+
+def get_pool(pool=None):
+    """Return the given pool, or the default pool of the importers if None."""
+    if pool is None:
+        return _default_pool
+    return pool
+
+
+def close_all():
+    """Close all the datasets kept open in the default pool of the importers."""
+    _default_pool.close_all()
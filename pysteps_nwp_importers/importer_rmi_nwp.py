@@ -53,27 +53,34 @@ The metadata contains the following key-value pairs:
 
 """
 
-import numpy as np
-
-import xarray as xr
+import logging
+from importlib.util import find_spec
 
+from pysteps_nwp_importers.dataset_pool import get_pool
 from pysteps_nwp_importers.exceptions import MissingOptionalDependency
-
-try:
-    import netCDF4
-
-    NETCDF4_IMPORTED = True
-except ImportError:
-    NETCDF4_IMPORTED = False
-
-try:
-    import dask
-
-    DASK_IMPORTED = True
-except ImportError:
-    DASK_IMPORTED = False
-
-
+from pysteps_nwp_importers.utils import (
+    Timings,
+    _add_import_kwargs_doc,
+    _import_nwp,
+    _is_lazy,
+    _iter_nwp,
+    get_packing,
+    get_zerovalue_threshold,
+    select_bbox,
+    select_members,
+    select_time_window,
+    unpack,
+)
+
+# the optional dependencies are only imported when a file is read, so that
+# the discovery of the importers by pysteps stays fast
+NETCDF4_IMPORTED = find_spec("netCDF4") is not None
+DASK_IMPORTED = find_spec("dask") is not None
+
+logger = logging.getLogger(__name__)
+
+
+@_add_import_kwargs_doc
 def import_rmi_nwp(filename, **kwargs):
     """Import a NetCDF with NWP rainfall forecasts from RMI using xarray.
 
@@ -81,13 +88,19 @@ def import_rmi_nwp(filename, **kwargs):
     ----------
     filename: str
         Name of the file to import.
+    {import_kwargs_doc}
+    clip_negative: bool, optional
+        If True, the negative values obtained when disaggregating accumulated
+        precipitation are set to zero. Defaults to False.
 
     {extra_kwargs_doc}
 
     Returns
     -------
     precipitation : array-like, float32
-        Precipitation field in mm/h. The dimensions are [time, rows, cols].
+        Precipitation field in mm/h. The dimensions are [time, rows, cols],
+        or [member, time, rows, cols] if the file has a member dimension.
+        If lazy is True, a dask array is returned.
     quality : 2D array or None
         If no quality information is available, set to None.
     metadata : dict
@@ -106,45 +119,171 @@ def import_rmi_nwp(filename, **kwargs):
             "products but it is not installed"
         )
 
-    ds = _import_rmi_nwp_data_xr(filename, **kwargs)
-    metadata = _import_rmi_nwp_geodata_xr(ds, **kwargs)
+    return _import_nwp(
+        import_rmi_nwp,
+        filename,
+        kwargs,
+        _import_rmi_nwp_data_xr,
+        _import_rmi_nwp_xr,
+        "precipitation",
+        logger,
+        # accumulated rainfall is disaggregated by time step
+        accumulated_varname="accum_prcp",
+    )
 
-    # rename varname_time (def: time) to t
-    varname_time = kwargs.get("varname_time", "time")
-    ds = ds.rename({varname_time: "t"})
-    varname_time = "t"
-    times_nwp = ds["t"].values
-    metadata["time_stamps"] = times_nwp
 
-    # if data variable is named accum_prcp
-    # it is assumed that NWP rainfall data is accumulated
-    # so it needs to be disagregated by time step
-    varname = kwargs.get("varname", "precipitation")
-    if varname == "accum_prcp":
-        print("Rainfall values are accumulated. Disaggregating by time step")
-        accum_prcp = ds[varname]
-        precipitation = accum_prcp - accum_prcp.shift({varname_time: 1})
-        precipitation = precipitation.dropna(varname_time, how="all")
-        # update/copy attributes
-        precipitation.name = "precipitation"
-        # copy attributes
-        precipitation.attrs.update({**accum_prcp.attrs})
-        # update attributes
-        precipitation.attrs.update({"standard_name": "precipitation_amount"})
-    else:
-        precipitation = ds[varname]
+# default dtype used by pysteps when the importer is called through
+# pysteps.io.get_method, which would otherwise cast the data to float64
+import_rmi_nwp.postprocess_kws = dict(dtype="float32")
+
 
-    quality = None
+def import_rmi_nwp_metadata(filename, **kwargs):
+    """Import the metadata of a NetCDF with NWP rainfall forecasts from RMI without
+    reading the precipitation data.
 
-    return precipitation.values, quality, metadata
+    Only the attributes and the coordinate variables are read from the file.
+
+    Parameters
+    ----------
+    filename: str
+        Name of the file to import.
+    compute_threshold: bool, optional
+        If True, the zerovalue and threshold are computed from the first time
+        step, which requires reading one field. Otherwise they are set to None.
+        Defaults to False.
+
+    The bbox, members, start_time and end_time keywords of
+    :py:func:`import_rmi_nwp` are also accepted.
+
+    Returns
+    -------
+    metadata : dict
+        Associated metadata (pixel sizes, map projections, etc.), with the same
+        keys as the metadata returned by :py:func:`import_rmi_nwp`.
+    """
+
+    if not NETCDF4_IMPORTED:
+        raise MissingOptionalDependency(
+            "netCDF4 package is required to import RMI NWP rainfall "
+            "products but it is not installed"
+        )
+
+    kwargs.setdefault("compute_threshold", False)
+    ds_file = _import_rmi_nwp_data_xr(filename, **kwargs)
+    try:
+        _, metadata = _import_rmi_nwp_xr(ds_file, **kwargs)
+    finally:
+        get_pool(kwargs.get("pool")).release(ds_file)
+
+    return metadata
+
+
+def iter_rmi_nwp(filename, **kwargs):
+    """Iterate over the lead times of a NetCDF with NWP rainfall forecasts from
+    RMI, reading one field at a time.
+
+    Only one time step is read from the file at each iteration, so the memory
+    use does not depend on the number of lead times. Accumulated values are
+    disaggregated by time step keeping only the previous accumulation in
+    memory.
+
+    Parameters
+    ----------
+    filename: str
+        Name of the file to import.
+    prefetch: int, optional
+        Number of lead times read ahead in a background thread while the
+        current field is processed. Defaults to 0, i.e. no prefetching.
+
+    The keywords of :py:func:`import_rmi_nwp` are also accepted, except lazy,
+    chunks, out, cache, target_grid and packed, which raise a ValueError. The
+    number of values corrected by sanitize is not reported.
+
+    Yields
+    ------
+    time_stamp : numpy.datetime64
+        Time stamp of the field.
+    precipitation : array, float32
+        Precipitation field. The dimensions are [rows, cols], or
+        [member, rows, cols] if the file has a member dimension.
+    metadata : dict
+        Associated metadata (pixel sizes, map projections, etc.), the same for
+        all the lead times.
+    """
+
+    if not NETCDF4_IMPORTED:
+        raise MissingOptionalDependency(
+            "netCDF4 package is required to import RMI NWP rainfall "
+            "products but it is not installed"
+        )
+
+    yield from _iter_nwp(
+        filename,
+        kwargs,
+        _import_rmi_nwp_data_xr,
+        _import_rmi_nwp_xr,
+        "precipitation",
+        accumulated_varname="accum_prcp",
+    )
+
+
+def _import_rmi_nwp_xr(ds, timings=None, **kwargs):
+    # move to meters if coordinates in kilometers
+    if ds.x.attrs.get("units") == "km":
+        ds = ds.assign_coords(
+            x=(ds.x * 1000.0).assign_attrs(units="m"),
+            y=(ds.y * 1000.0).assign_attrs(units="m"),
+        )
+
+    ds = select_bbox(ds, kwargs.get("bbox"))
+    ds, _ = select_members(
+        ds,
+        kwargs.get("varname", "precipitation"),
+        kwargs.get("members"),
+        kwargs.get("varname_member"),
+    )
+    metadata = _import_rmi_nwp_geodata_xr(ds, timings=timings, **kwargs)
+
+    # select the requested lead times before any data is read, including the
+    # preceding time step if accumulated values have to be disaggregated
+    varname_time = kwargs.get("varname_time", "time")
+    accumulated = kwargs.get("varname", "precipitation") == "accum_prcp"
+    ds = select_time_window(
+        ds,
+        varname_time,
+        kwargs.get("start_time"),
+        kwargs.get("end_time"),
+        n_before=1 if accumulated else 0,
+    )
+
+    # rename varname_time (def: time) to t
+    ds = ds.rename({varname_time: "t"})
+    metadata["time_stamps"] = ds["t"].values
+
+    return ds, metadata
 
 
 def _import_rmi_nwp_data_xr(filename, **kwargs):
-    return xr.open_dataset(filename)
+    varname_time = kwargs.get("varname_time", "time")
+    chunks = kwargs.get("chunks", None)
+    if chunks is None and _is_lazy(**kwargs):
+        # one chunk per lead time
+        chunks = {varname_time: 1}
+    # only the precipitation and its coordinates, the projection being a global
+    # attribute are read
+    variables = (kwargs.get("varname", "precipitation"), varname_time)
+    return get_pool(kwargs.get("pool")).open(
+        filename,
+        variables=variables,
+        chunks=chunks,
+        # the packed values are read as they are stored in the file
+        mask_and_scale=not kwargs.get("packed", False),
+    )
 
 
 def _import_rmi_nwp_geodata_xr(
     ds_in,
+    timings=None,
     **kwargs,
 ):
     varname = kwargs.get("varname", "precipitation")
@@ -169,14 +308,6 @@ def _import_rmi_nwp_geodata_xr(
             units = "mm"
 
     # get spatial boundaries and pixelsize
-    # move to meters if coordinates in kilometers
-    if "units" in ds_in.x.attrs:
-        if ds_in.x.units == "km":
-            ds_in["x"] = ds_in.x * 1000.0
-            ds_in.x.attrs.update({"units": "m"})
-            ds_in["y"] = ds_in.y * 1000.0
-            ds_in.y.attrs.update({"units": "m"})
-
     xmin = ds_in.x.min().values
     xmax = ds_in.x.max().values
     ymin = ds_in.y.min().values
@@ -184,9 +315,6 @@ def _import_rmi_nwp_geodata_xr(
     xpixelsize = abs(ds_in.x[1] - ds_in.x[0])
     ypixelsize = abs(ds_in.y[1] - ds_in.y[0])
 
-    # Add metadata needed by pySTEPS as attrs in rainfall variable
-    da_rainfall = ds_in[varname].isel({varname_time: 0})
-
     # Fill the metadata dictionary
     metadata = dict(
         xpixelsize=xpixelsize.values,
@@ -194,11 +322,11 @@ def _import_rmi_nwp_geodata_xr(
         cartesian_unit=ds_in.x.units,
         unit=units,
         transform=None,
-        zerovalue=np.nanmin(da_rainfall),
+        zerovalue=None,
         institution="Royal Meteorological Institute of Belgium",
         projection=projdef,
         yorigin="upper",
-        threshold=_get_threshold_value(da_rainfall.values),
+        threshold=None,
         x1=xmin,
         x2=xmax,
         y1=ymin,
@@ -206,28 +334,20 @@ def _import_rmi_nwp_geodata_xr(
         accutime=time_step,
     )
 
-    return metadata
-
-
-def _get_threshold_value(precip):
-    """
-    Get the rain/no rain threshold with the same unit, transformation and
-    accutime of the data.
-    If all the values are NaNs, the returned value is `np.nan`.
-    Otherwise, np.min(precip[precip > precip.min()]) is returned.
+    # the rain/no rain values require reading the first time step
+    if kwargs.get("compute_threshold", True):
+        if timings is None:
+            timings = Timings()
+        with timings.stage("threshold"):
+            da_rainfall = ds_in[varname].isel({varname_time: 0})
+            data = da_rainfall.data
+            if kwargs.get("packed", False):
+                # the values are computed in the units of the unpacked values
+                data = unpack(data, get_packing(ds_in[varname]))
+            zerovalue, threshold = get_zerovalue_threshold(
+                data, clip_negative=kwargs.get("sanitize") is not None
+            )
+            metadata["zerovalue"] = zerovalue
+            metadata["threshold"] = threshold
 
-    Returns
-    -------
-    threshold: float
-    """
-    valid_mask = np.isfinite(precip)
-    if valid_mask.any():
-        _precip = precip[valid_mask]
-        min_precip = _precip.min()
-        above_min_mask = _precip > min_precip
-        if above_min_mask.any():
-            return np.min(_precip[above_min_mask])
-        else:
-            return min_precip
-    else:
-        return np.nan
+    return metadata
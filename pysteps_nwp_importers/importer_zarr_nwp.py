@@ -0,0 +1,219 @@
+"""
+pysteps_nwp_importers.importer_zarr_nwp
+====================
+
+Module to import the NWP forecasts converted to a Zarr store with
+:py:func:`pysteps_nwp_importers.zarr_converter.convert_to_zarr`. The output of
+this method is the same as the output of the importer used for the
+conversion: a numpy array containing the forecast rainfall fields of a run
+and the metadata of the run as dictionary.
+
+The store contains the following variables, the runs being appended along
+the run dimension:
+
+.. tabularcolumns:: |p{2cm}|L|
+
++------------------+----------------------------------------------------------+
+|     Variable     |                Value                                     |
++==================+==========================================================+
+|   precipitation  | precipitation of the runs, with the dimensions           |
+|                  | [run, t, y, x], or [run, member, t, y, x] for ensemble   |
+|                  | forecasts, and one chunk per member and time step by     |
+|                  | default                                                  |
++------------------+----------------------------------------------------------+
+|   time_stamps    | time stamps of the runs, with the dimensions             |
+|                  | [run, t_stamp]                                           |
++------------------+----------------------------------------------------------+
+|   zerovalue      | zerovalue of the runs                                    |
++------------------+----------------------------------------------------------+
+|   threshold      | threshold of the runs                                    |
++------------------+----------------------------------------------------------+
+
+The other metadata, shared by the runs, are stored as attributes of the store.
+"""
+
+from importlib.util import find_spec
+
+import numpy as np
+
+from pysteps_nwp_importers.exceptions import MissingOptionalDependency
+from pysteps_nwp_importers.utils import (
+    load_array,
+    select_bbox,
+    select_members,
+    select_time_window,
+)
+
+ZARR_IMPORTED = find_spec("zarr") is not None
+
+# metadata shared by all the runs of a store, stored as attributes
+ATTRS_KEYS = (
+    "projection",
+    "cartesian_unit",
+    "yorigin",
+    "institution",
+    "unit",
+    "transform",
+    "accutime",
+    "xpixelsize",
+    "ypixelsize",
+)
+
+# metadata of each run, stored as variables along the run dimension
+RUN_KEYS = ("zerovalue", "threshold")
+
+
+def import_zarr_nwp(filename, **kwargs):
+    """Import a run of NWP rainfall forecasts from a Zarr store.
+
+    Parameters
+    ----------
+    filename: str
+        Path of the Zarr store.
+    run: int, optional
+        Index of the run to import along the run dimension of the store.
+        Defaults to -1, the last run appended to the store.
+    lazy: bool, optional
+        If True, the precipitation is returned as a dask array with the chunks
+        of the store, so that a chunk is only read when it is computed.
+        Defaults to False.
+    chunks: dict, optional
+        Chunk sizes of the dask array, as a mapping from dimension names
+        to chunk sizes. Setting it implies ``lazy=True``.
+    bbox: tuple, optional
+        Bounding box (x1, y1, x2, y2) of the sub-domain to import, in the
+        same coordinates and units as the x1, y1, x2 and y2 metadata. The
+        zerovalue and threshold metadata are those of the whole domain.
+    members: int or list of int, optional
+        Indices of the ensemble members to import, if the store has a member
+        dimension. The zerovalue and threshold metadata are those of all the
+        members. Defaults to all the members.
+    dtype: str, optional
+        Data type of the returned precipitation. Defaults to "float32".
+    out: numpy.ndarray, optional
+        Preallocated array to which the precipitation is written, with the
+        shape of the returned precipitation. If given, its data type is used
+        instead of dtype. Not used if lazy is True.
+    start_time: datetime-like, optional
+        First lead time to import (inclusive). Defaults to the first time step
+        of the run.
+    end_time: datetime-like, optional
+        Last lead time to import (inclusive). Defaults to the last time step
+        of the run.
+
+    {extra_kwargs_doc}
+
+    Returns
+    -------
+    precipitation : array-like, float32
+        Precipitation field in mm/h. The dimensions are [time, rows, cols],
+        or [member, time, rows, cols] if the store has a member dimension.
+        If lazy is True, a dask array is returned.
+    quality : 2D array or None
+        If no quality information is available, set to None.
+    metadata : dict
+        Associated metadata (pixel sizes, map projections, etc.), as returned
+        by the importer used to convert the run.
+    """
+
+    if not ZARR_IMPORTED:
+        raise MissingOptionalDependency(
+            "zarr package is required to import NWP rainfall forecasts "
+            "from a Zarr store but it is not installed"
+        )
+
+    ds_store = _open_zarr_store(filename, **kwargs)
+    try:
+        ds, metadata = _import_zarr_nwp_xr(ds_store, **kwargs)
+        precipitation = load_array(
+            ds["precipitation"],
+            kwargs.get("dtype", "float32"),
+            out=kwargs.get("out"),
+        )
+    finally:
+        if not _is_lazy(**kwargs):
+            ds_store.close()
+
+    quality = None
+
+    return precipitation, quality, metadata
+
+
+# default dtype used by pysteps when the importer is called through
+# pysteps.io.get_method, which would otherwise cast the data to float64
+import_zarr_nwp.postprocess_kws = dict(dtype="float32")
+
+
+def import_zarr_nwp_metadata(filename, **kwargs):
+    """Import the metadata of a run of NWP rainfall forecasts from a Zarr store
+    without reading the precipitation data.
+
+    Parameters
+    ----------
+    filename: str
+        Path of the Zarr store.
+
+    The run, bbox, members, start_time and end_time keywords of
+    :py:func:`import_zarr_nwp` are also accepted.
+
+    Returns
+    -------
+    metadata : dict
+        Associated metadata (pixel sizes, map projections, etc.), with the same
+        keys as the metadata returned by :py:func:`import_zarr_nwp`.
+    """
+
+    if not ZARR_IMPORTED:
+        raise MissingOptionalDependency(
+            "zarr package is required to import NWP rainfall forecasts "
+            "from a Zarr store but it is not installed"
+        )
+
+    with _open_zarr_store(filename) as ds_store:
+        _, metadata = _import_zarr_nwp_xr(ds_store, **kwargs)
+
+    return metadata
+
+
+def _import_zarr_nwp_xr(ds, **kwargs):
+    ds = ds.isel(run=kwargs.get("run", -1))
+    ds, _ = select_members(ds, "precipitation", kwargs.get("members"))
+    ds = select_bbox(ds, kwargs.get("bbox"))
+
+    # the time stamps of accumulated forecasts include the time step
+    # preceding the first field
+    time_stamps = ds["time_stamps"].values
+    n_before = time_stamps.size - ds.sizes["t"]
+    ds = ds.assign_coords(t=time_stamps[n_before:])
+    ds = select_time_window(ds, "t", kwargs.get("start_time"), kwargs.get("end_time"))
+    first = np.searchsorted(time_stamps, ds["t"].values[0]) - n_before
+    time_stamps = time_stamps[first : first + ds.sizes["t"] + n_before]
+
+    metadata = {key: ds.attrs[key] for key in ATTRS_KEYS}
+    for key in RUN_KEYS:
+        value = float(ds[key].values)
+        metadata[key] = None if np.isnan(value) else value
+    metadata.update(
+        x1=ds.x.values.min(),
+        x2=ds.x.values.max(),
+        y1=ds.y.values.min(),
+        y2=ds.y.values.max(),
+        time_stamps=time_stamps,
+    )
+
+    return ds, metadata
+
+
+def _open_zarr_store(filename, **kwargs):
+    chunks = kwargs.get("chunks", None)
+    if chunks is None and _is_lazy(**kwargs):
+        # the chunks of the store
+        chunks = {}
+
+    import xarray as xr
+
+    return xr.open_zarr(filename, chunks=chunks)
+
+
+def _is_lazy(**kwargs):
+    return kwargs.get("lazy", False) or kwargs.get("chunks", None) is not None
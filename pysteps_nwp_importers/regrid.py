@@ -0,0 +1,261 @@
+"""
+pysteps_nwp_importers.regrid
+====================
+
+Regridding of the imported NWP forecasts onto another grid, e.g. the grid of
+a radar composite.
+
+The fields are interpolated bilinearly. The interpolation weights only depend
+on the source and target grids, so they are computed once as a sparse matrix
+mapping the source grid points to the target grid points, and applied to the
+fields one at a time as a sparse matrix product, in the data type of the
+fields, so that the only temporary array is a field of the target grid. The
+weights are cached in memory and on disk, in a file named after a hash of the two
+grid definitions, so that they are also reused by other processes.
+
+The importers regrid the precipitation when they are given a ``target_grid``::
+
+    precip, _, metadata = import_knmi_nwp(filename, target_grid=radar_metadata)
+
+.. autosummary::
+    :toctree: ../generated/
+
+    get_regrid_weights
+    regrid
+"""
+
+import functools
+import hashlib
+import os
+import tempfile
+from importlib.util import find_spec
+
+import numpy as np
+
+from pysteps_nwp_importers.exceptions import MissingOptionalDependency
+from pysteps_nwp_importers.utils import _get_out_array
+
+PYPROJ_IMPORTED = find_spec("pyproj") is not None
+SCIPY_IMPORTED = find_spec("scipy") is not None
+
+# default directory of the cached weights
+WEIGHTS_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "pysteps_nwp_importers", "regrid"
+)
+
+# metadata keys of the target grid updated by the regridding
+GRID_KEYS = (
+    "projection",
+    "x1",
+    "x2",
+    "y1",
+    "y2",
+    "xpixelsize",
+    "ypixelsize",
+    "yorigin",
+    "cartesian_unit",
+)
+
+
+def regrid(precipitation, metadata, target_grid, weights_dir=None, out=None):
+    """Interpolate precipitation fields onto a target grid.
+
+    Parameters
+    ----------
+    precipitation: array-like
+        Precipitation fields with the rows and columns as last two dimensions,
+        on the grid described by metadata. Dask arrays are regridded lazily.
+    metadata: dict
+        Metadata of the precipitation, as returned by the importers, where
+        x1, y1, x2 and y2 are the coordinates of the centres of the corner
+        grid points.
+    target_grid: dict
+        Metadata of the target grid in the pysteps format, with the keys
+        projection, x1, y1, x2, y2, xpixelsize, ypixelsize and yorigin,
+        where x1, y1, x2 and y2 are the coordinates of the corners of the
+        raster, as returned by the pysteps radar importers.
+    weights_dir: str, optional
+        Directory of the cached weights. Defaults to WEIGHTS_DIR.
+    out: numpy.ndarray, optional
+        Preallocated array to which the regridded precipitation is written.
+        Not used for dask arrays.
+
+    Returns
+    -------
+    precipitation: array-like
+        Precipitation on the target grid, with the data type of the input.
+        The target grid points outside of the source grid are set to NaN.
+    metadata: dict
+        Metadata of the precipitation, with the grid keys of the target grid.
+    """
+    weights, valid, target_shape = get_regrid_weights(
+        metadata, precipitation.shape[-2:], target_grid, weights_dir
+    )
+    # cast once, so that the products are computed in the data type of the
+    # fields, e.g. float32, instead of float64
+    weights = weights.astype(np.result_type(precipitation.dtype, np.float32))
+    invalid = ~valid.reshape(target_shape)
+
+    def _regrid_block(block, out=None):
+        out = _get_out_array(out, block.shape[:-2] + target_shape, block.dtype)
+        for index in np.ndindex(block.shape[:-2]):
+            field = weights @ block[index].ravel()
+            out[index] = field.reshape(target_shape)
+            out[index][invalid] = np.nan
+        return out
+
+    if getattr(precipitation, "chunks", None) is not None:
+        # the fields must not be split between chunks
+        precipitation = precipitation.rechunk({-2: -1, -1: -1})
+        chunks = precipitation.chunks[:-2] + tuple((n,) for n in target_shape)
+        precipitation = precipitation.map_blocks(
+            _regrid_block, chunks=chunks, dtype=precipitation.dtype
+        )
+    else:
+        precipitation = _regrid_block(np.asarray(precipitation), out=out)
+
+    metadata = dict(metadata)
+    metadata.update({key: target_grid[key] for key in GRID_KEYS if key in target_grid})
+    # the importers give the coordinates of the centres of the grid points
+    metadata["x1"] = target_grid["x1"] + target_grid["xpixelsize"] / 2
+    metadata["x2"] = target_grid["x2"] - target_grid["xpixelsize"] / 2
+    metadata["y1"] = target_grid["y1"] + target_grid["ypixelsize"] / 2
+    metadata["y2"] = target_grid["y2"] - target_grid["ypixelsize"] / 2
+    return precipitation, metadata
+
+
+def get_regrid_weights(metadata, shape, target_grid, weights_dir=None):
+    """Get the bilinear interpolation weights from a source grid to a target
+    grid, from the cache if they were already computed.
+
+    Parameters
+    ----------
+    metadata: dict
+        Metadata of the source grid, as returned by the importers.
+    shape: tuple
+        Number of rows and columns of the source grid.
+    target_grid: dict
+        Metadata of the target grid in the pysteps format.
+    weights_dir: str, optional
+        Directory of the cached weights. Defaults to WEIGHTS_DIR.
+
+    Returns
+    -------
+    weights: scipy.sparse.csr_matrix
+        Sparse matrix of shape (target points, source points).
+    valid: numpy.ndarray
+        Boolean mask of the target points within the source grid.
+    target_shape: tuple
+        Number of rows and columns of the target grid.
+    """
+    if not PYPROJ_IMPORTED or not SCIPY_IMPORTED:
+        raise MissingOptionalDependency(
+            "pyproj and scipy packages are required to regrid NWP rainfall "
+            "forecasts but they are not installed"
+        )
+
+    source = _grid_definition(metadata, shape, corners=False)
+    target = _grid_definition(target_grid, None, corners=True)
+    return _get_weights(source, target, weights_dir or WEIGHTS_DIR)
+
+
+def _grid_definition(grid, shape, corners):
+    """Return a hashable definition of a grid: projection, coordinates of the
+    first grid point, signed pixel sizes and shape."""
+    xpixelsize = float(grid["xpixelsize"])
+    ypixelsize = float(grid["ypixelsize"])
+    x1, x2 = float(grid["x1"]), float(grid["x2"])
+    y1, y2 = float(grid["y1"]), float(grid["y2"])
+    if corners:
+        x1, x2 = x1 + xpixelsize / 2, x2 - xpixelsize / 2
+        y1, y2 = y1 + ypixelsize / 2, y2 - ypixelsize / 2
+    if shape is None:
+        shape = (
+            int(round((y2 - y1) / ypixelsize)) + 1,
+            int(round((x2 - x1) / xpixelsize)) + 1,
+        )
+    if grid["yorigin"] == "upper":
+        y_first, dy = y2, -ypixelsize
+    else:
+        y_first, dy = y1, ypixelsize
+    return (grid["projection"], x1, y_first, xpixelsize, dy, tuple(shape))
+
+
+@functools.lru_cache(maxsize=16)
+def _get_weights(source, target, weights_dir):
+    key = hashlib.sha256(repr(("bilinear", source, target)).encode()).hexdigest()
+    path = os.path.join(weights_dir, f"{key}.npz")
+    if os.path.isfile(path):
+        with np.load(path) as cached:
+            weights = _to_sparse(cached, source, target)
+            return weights, cached["valid"], target[-1]
+
+    rows, cols, values, valid = _compute_weights(source, target)
+
+    # written under a temporary name and renamed, so that concurrent readers
+    # never see partial files
+    os.makedirs(weights_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=weights_dir, suffix=".npz.tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, rows=rows, cols=cols, values=values, valid=valid)
+    os.replace(tmp_path, path)
+
+    weights = _to_sparse(dict(rows=rows, cols=cols, values=values), source, target)
+    return weights, valid, target[-1]
+
+
+def _to_sparse(arrays, source, target):
+    from scipy import sparse
+
+    n_source = int(np.prod(source[-1]))
+    n_target = int(np.prod(target[-1]))
+    return sparse.csr_matrix(
+        (arrays["values"], (arrays["rows"], arrays["cols"])),
+        shape=(n_target, n_source),
+    )
+
+
+def _compute_weights(source, target):
+    """Compute the bilinear weights of the target points in the source grid."""
+    import pyproj
+
+    projection, x_first, y_first, dx, dy, (n_rows, n_cols) = source
+    t_projection, t_x_first, t_y_first, t_dx, t_dy, t_shape = target
+
+    # coordinates of the target points in the source projection
+    x = t_x_first + np.arange(t_shape[1]) * t_dx
+    y = t_y_first + np.arange(t_shape[0]) * t_dy
+    x, y = np.meshgrid(x, y)
+    transformer = pyproj.Transformer.from_crs(
+        pyproj.CRS.from_user_input(t_projection),
+        pyproj.CRS.from_user_input(projection),
+        always_xy=True,
+    )
+    x, y = transformer.transform(x.ravel(), y.ravel())
+
+    # fractional indices of the target points in the source grid
+    col = (np.asarray(x) - x_first) / dx
+    row = (np.asarray(y) - y_first) / dy
+    valid = (col >= 0) & (col <= n_cols - 1) & (row >= 0) & (row <= n_rows - 1)
+
+    targets = np.flatnonzero(valid)
+    col0 = np.minimum(np.floor(col[valid]).astype(int), n_cols - 2)
+    row0 = np.minimum(np.floor(row[valid]).astype(int), n_rows - 2)
+    wx = col[valid] - col0
+    wy = row[valid] - row0
+
+    rows = np.concatenate([targets] * 4)
+    cols = np.concatenate(
+        [
+            row0 * n_cols + col0,
+            row0 * n_cols + col0 + 1,
+            (row0 + 1) * n_cols + col0,
+            (row0 + 1) * n_cols + col0 + 1,
+        ]
+    )
+    values = np.concatenate(
+        [(1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx]
+    )
+    # the weights of the grid points falling exactly on a source grid line
+    nonzero = values != 0.0
+    return rows[nonzero], cols[nonzero], values[nonzero], valid
@@ -0,0 +1,245 @@
+"""
+pysteps_nwp_importers.temporal
+====================
+
+Interpolation of the imported NWP forecasts to a finer time step, e.g. the
+time step of a radar nowcast.
+
+The precipitation returned by the importers is accumulated over the time step
+of the file (the accutime metadata). It is interpolated to a time step that
+divides the time step of the file, with one of two methods:
+
+- "split": each accumulation is split evenly between the finer time steps, so
+  that the total precipitation is conserved;
+- "linear": the rates are interpolated linearly between the time stamps of
+  the fields.
+
+In both cases the interpolated values are accumulated over the finer time
+step, and the time_stamps, accutime, zerovalue and threshold metadata are
+updated accordingly. The whole forecast is interpolated with one broadcast
+over the time dimension, and the streamed fields one output time step at a
+time.
+
+The importers interpolate the precipitation when they are given a
+``target_timestep`` in minutes::
+
+    precip, _, metadata = import_knmi_nwp(filename, target_timestep=5)
+
+.. autosummary::
+    :toctree: ../generated/
+
+    interpolate_time
+    interpolate_time_metadata
+    iter_interpolate_time
+"""
+
+import numpy as np
+
+from pysteps_nwp_importers.utils import _get_out_array
+
+METHODS = ("split", "linear")
+
+
+def interpolate_time(
+    precipitation, metadata, target_timestep, method="split", out=None, time_axis=0
+):
+    """Interpolate precipitation fields to a finer time step.
+
+    Parameters
+    ----------
+    precipitation: array-like
+        Precipitation accumulated over the accutime of the metadata, with a
+        time dimension. Dask arrays are interpolated lazily.
+    metadata: dict
+        Metadata of the precipitation, as returned by the importers.
+    target_timestep: int
+        Time step in minutes of the interpolated precipitation. It must divide
+        the accutime of the metadata.
+    method: {"split", "linear"}
+        Interpolation method, see :py:mod:`pysteps_nwp_importers.temporal`.
+    out: numpy.ndarray, optional
+        Preallocated array to which the interpolated precipitation is written.
+        Not used for dask arrays.
+    time_axis: int
+        Axis of the time dimension, e.g. 1 for [member, time, rows, cols].
+
+    Returns
+    -------
+    precipitation: array-like
+        Precipitation accumulated over the target time step, with the data
+        type of the input. With the "split" method, T fields become T * k
+        fields, k being the ratio of the time steps. With the "linear" method,
+        they become (T - 1) * k + 1 fields, from the first to the last time
+        stamp of the input.
+    metadata: dict
+        Metadata of the interpolated precipitation.
+    """
+    n_steps = _get_n_steps(metadata, target_timestep, method)
+    new_metadata = interpolate_time_metadata(
+        metadata, target_timestep, method, n_fields=precipitation.shape[time_axis]
+    )
+    if n_steps == 1:
+        if out is not None:
+            out[...] = precipitation
+            precipitation = out
+        return precipitation, new_metadata
+
+    dtype = precipitation.dtype
+    leading = (slice(None),) * time_axis
+    # the finer time steps are broadcast along a new axis after the time axis
+    new_axis = leading + (slice(None), None)
+    weights = (np.arange(n_steps, dtype=dtype) / n_steps)[:, None, None]
+    scale = dtype.type(1.0 / n_steps)
+
+    shape = precipitation.shape
+    n_times = shape[time_axis]
+    if method == "split":
+        n_out = n_times * n_steps
+    else:
+        n_out = (n_times - 1) * n_steps + 1
+    out_shape = shape[:time_axis] + (n_out,) + shape[time_axis + 1 :]
+    split_shape = shape[:time_axis] + (n_out // n_steps, n_steps)
+    split_shape += shape[time_axis + 1 :]
+
+    first = precipitation[leading + (slice(-1),)]
+    last = precipitation[leading + (slice(-1, None),)]
+
+    if getattr(precipitation, "chunks", None) is not None:
+        import dask.array as da
+
+        if method == "split":
+            steps = da.broadcast_to(precipitation[new_axis] * scale, split_shape)
+            return steps.reshape(out_shape), new_metadata
+        following = precipitation[leading + (slice(1, None),)]
+        steps = first[new_axis] * scale
+        steps = steps + (following - first)[new_axis] * (weights * scale)
+        steps = steps.reshape(split_shape[:time_axis] + (-1,) + shape[time_axis + 1 :])
+        return da.concatenate([steps, last * scale], axis=time_axis), new_metadata
+
+    out = _get_out_array(out, out_shape, dtype)
+    if method == "split":
+        steps = out.reshape(split_shape)
+        np.multiply(precipitation[new_axis], scale, out=steps)
+    else:
+        following = precipitation[leading + (slice(1, None),)]
+        steps = out[leading + (slice(-1),)].reshape(split_shape)
+        # first + (following - first) * w, without temporaries of the output
+        np.multiply((following - first)[new_axis], weights * scale, out=steps)
+        steps += first[new_axis] * scale
+        np.multiply(last, scale, out=out[leading + (slice(-1, None),)])
+
+    return out, new_metadata
+
+
+def interpolate_time_metadata(metadata, target_timestep, method="split", n_fields=None):
+    """Update the metadata of precipitation interpolated to a finer time step.
+
+    Parameters
+    ----------
+    metadata: dict
+        Metadata of the precipitation, as returned by the importers.
+    target_timestep: int
+        Time step in minutes of the interpolated precipitation.
+    method: {"split", "linear"}
+        Interpolation method.
+    n_fields: int, optional
+        Number of time steps of the precipitation. The time stamps of
+        accumulated forecasts include the time step preceding the first field.
+        Defaults to the number of time stamps.
+
+    Returns
+    -------
+    metadata: dict
+        Copy of the metadata with the time_stamps, accutime, zerovalue and
+        threshold of the interpolated precipitation.
+    """
+    n_steps = _get_n_steps(metadata, target_timestep, method)
+    metadata = dict(metadata)
+    for key in ("zerovalue", "threshold"):
+        if metadata.get(key) is not None:
+            metadata[key] = metadata[key] / n_steps
+    metadata["accutime"] = target_timestep
+
+    time_stamps = metadata.get("time_stamps")
+    if time_stamps is not None and n_steps > 1:
+        time_stamps = np.asarray(time_stamps)
+        n_before = 0 if n_fields is None else time_stamps.size - n_fields
+        valid_stamps = time_stamps[n_before:]
+        timestep = np.timedelta64(int(target_timestep), "m")
+        offsets = np.arange(n_steps) * timestep
+        if method == "split":
+            # the steps within the time step ending at each time stamp
+            new_stamps = (valid_stamps[:, None] - offsets[::-1]).ravel()
+        else:
+            new_stamps = (valid_stamps[:-1, None] + offsets).ravel()
+            new_stamps = np.append(new_stamps, valid_stamps[-1])
+        if n_before:
+            new_stamps = np.insert(new_stamps, 0, new_stamps[0] - timestep)
+        metadata["time_stamps"] = new_stamps.astype(time_stamps.dtype)
+
+    return metadata
+
+
+def iter_interpolate_time(fields, metadata, target_timestep, method="split"):
+    """Interpolate streamed precipitation fields to a finer time step, one
+    output time step at a time.
+
+    Parameters
+    ----------
+    fields: iterator
+        Time stamps and fields, as yielded by the iterators of the importers.
+        It is closed when the returned generator is closed.
+    metadata: dict
+        Metadata of the fields, as returned by the importers.
+    target_timestep: int
+        Time step in minutes of the interpolated precipitation.
+    method: {"split", "linear"}
+        Interpolation method.
+
+    Yields
+    ------
+    time_stamp: numpy.datetime64
+        Time stamp of the interpolated field.
+    field: numpy.ndarray
+        Precipitation accumulated over the target time step.
+    """
+    n_steps = _get_n_steps(metadata, target_timestep, method)
+    timestep = np.timedelta64(int(target_timestep), "m")
+    try:
+        previous = None
+        for time_stamp, field in fields:
+            scale = field.dtype.type(1.0 / n_steps)
+            if method == "split":
+                for i in range(n_steps - 1, -1, -1):
+                    yield time_stamp - i * timestep, field * scale
+                continue
+
+            if previous is not None:
+                previous_time_stamp, previous_field = previous
+                for i in range(1, n_steps):
+                    weight = field.dtype.type(i / n_steps)
+                    step = previous_field + (field - previous_field) * weight
+                    step *= scale
+                    yield previous_time_stamp + i * timestep, step
+            yield time_stamp, field * scale
+            previous = time_stamp, field
+    finally:
+        if hasattr(fields, "close"):
+            fields.close()
+
+
+def _get_n_steps(metadata, target_timestep, method):
+    """Return the number of target time steps per time step of the data."""
+    if method not in METHODS:
+        raise ValueError(
+            f"unknown time interpolation method {method}, expected one of "
+            f"{', '.join(METHODS)}"
+        )
+    accutime = int(metadata["accutime"])
+    target_timestep = int(target_timestep)
+    if target_timestep <= 0 or accutime % target_timestep != 0:
+        raise ValueError(
+            f"the target time step ({target_timestep} min) must divide the "
+            f"time step of the data ({accutime} min)"
+        )
+    return accutime // target_timestep
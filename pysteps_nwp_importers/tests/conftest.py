@@ -0,0 +1,36 @@
+import pytest
+
+from pysteps_nwp_importers.tests.synthetic_data import write_synthetic_nwp_file
+
+
+@pytest.fixture(scope="session")
+def synthetic_files(tmp_path_factory):
+    """Paths to small synthetic NWP files, one per supported layout."""
+    tmp_dir = tmp_path_factory.mktemp("synthetic_nwp")
+    paths = {}
+    for layout in ("knmi", "bom", "rmi"):
+        paths[layout] = write_synthetic_nwp_file(tmp_dir / f"{layout}_nwp.nc", layout)
+    return paths
+
+
+@pytest.fixture(scope="session")
+def synthetic_file_factory(tmp_path_factory):
+    """Factory writing a synthetic NWP file with the given layout and size,
+    see :py:func:`synthetic_data.synthetic_nwp_dataset` for the options."""
+    tmp_dir = tmp_path_factory.mktemp("synthetic_nwp_sized")
+
+    def _make_file(layout, n_times=7, n_rows=20, n_cols=24, **kwargs):
+        options = "_".join(f"{key}{value}" for key, value in sorted(kwargs.items()))
+        path = tmp_dir / f"{layout}_{n_times}x{n_rows}x{n_cols}_{options}.nc"
+        if not path.is_file():
+            write_synthetic_nwp_file(
+                path,
+                layout,
+                n_leadtimes=n_times,
+                n_rows=n_rows,
+                n_cols=n_cols,
+                **kwargs,
+            )
+        return str(path)
+
+    return _make_file
@@ -0,0 +1,231 @@
+"""
+Generator of synthetic NWP files with the layout of the KNMI, BoM and RMI
+files, so that the importers can be tested and benchmarked offline and at any
+grid size.
+
+The files are written one time step at a time, so that files much larger than
+the memory, e.g. 500 lead times of 2000x2000 fields, can be generated::
+
+    python -m pysteps_nwp_importers.tests.synthetic_data bom bom.nc \\
+        --n-leadtimes 500 --n-rows 2000 --n-cols 2000
+"""
+
+import argparse
+
+import dask.array as da
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+LAYOUTS = ("knmi", "bom", "rmi")
+
+# packing of the precipitation in 16-bit integers, covering 0 to 955 mm in
+# steps of 0.02 mm
+PACKING = dict(dtype="int16", scale_factor=0.02, add_offset=300.0, _FillValue=-32767)
+
+# start time and time step in minutes of the real files
+TIMES = dict(
+    knmi=("2018-09-05 06:00", 60),
+    bom=("2020-10-31 00:00", 10),
+    rmi=("2021-07-04 16:05", 5),
+)
+
+
+def synthetic_nwp_dataset(
+    layout,
+    n_leadtimes=7,
+    n_rows=20,
+    n_cols=24,
+    timestep=None,
+    n_members=None,
+    n_extra_variables=0,
+    seed=42,
+):
+    """Build a dataset with the variable, coordinate and projection layout of
+    the KNMI, BoM or RMI NWP files.
+
+    The precipitation is a dask array with one chunk per time step, drawn
+    from a gamma distribution with about half of the grid points set to zero.
+
+    Parameters
+    ----------
+    layout: {"knmi", "bom", "rmi"}
+        Layout of the file.
+    n_leadtimes: int
+        Number of time steps.
+    n_rows, n_cols: int
+        Size of the grid.
+    timestep: int, optional
+        Time step in minutes. Defaults to the time step of the real files.
+    n_members: int, optional
+        Number of ensemble members. If given, the precipitation has a member
+        dimension before the time dimension.
+    n_extra_variables: int
+        Number of other fields in the dataset, e.g. the other forecast
+        variables of operational files, with the dimensions of the
+        precipitation.
+    seed: int
+        Seed of the random fields.
+
+    Returns
+    -------
+    ds: xarray.Dataset
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown layout {layout}")
+
+    start_time, default_timestep = TIMES[layout]
+    times = pd.date_range(
+        start_time, periods=n_leadtimes, freq=f"{timestep or default_timestep}min"
+    )
+
+    shape = (n_leadtimes, n_rows, n_cols)
+    chunks = (1, n_rows, n_cols)
+    dims = ("time", "y", "x")
+    if n_members is not None:
+        shape = (n_members,) + shape
+        chunks = (1,) + chunks
+        dims = ("member",) + dims
+    rates = da.random.RandomState(seed).gamma(0.3, 2.0, size=shape, chunks=chunks)
+    rates = rates.astype("float32")
+    rates = da.where(rates < 0.5, np.float32(0.0), rates)
+
+    if layout == "knmi":
+        x = np.round(np.arange(n_cols) * 0.037, 3)
+        y = np.round(49.0 + np.arange(n_rows) * 0.023, 3)
+        ds = xr.Dataset(
+            {"P_fc": (dims, rates, {"units": "kg m-2"})},
+            coords={
+                "time": times,
+                "x": ("x", x, {"units": "degrees_east"}),
+                "y": ("y", y, {"units": "degrees_north"}),
+            },
+            attrs={"institution": "Royal Netherlands Meteorological Institute"},
+        )
+        ds["crs"] = xr.DataArray(
+            0, attrs={"proj4_params": "+proj=longlat +ellps=WGS84 +datum=WGS84"}
+        )
+    elif layout == "bom":
+        x = (np.arange(n_cols) - (n_cols - 1) / 2) * 0.5
+        y = ((n_rows - 1) / 2 - np.arange(n_rows)) * 0.5
+        # the accumulation starts at zero at the first time step
+        time_axis = dims.index("time")
+        first = da.zeros_like(da.take(rates, [0], axis=time_axis))
+        rest = da.take(rates, np.arange(1, n_leadtimes), axis=time_axis)
+        accum = da.cumsum(da.concatenate([first, rest], axis=time_axis), time_axis)
+        ds = xr.Dataset(
+            {"accum_prcp": (dims, accum.rechunk(chunks), {"units": "kg m-2"})},
+            coords={
+                "time": times,
+                "x": ("x", x, {"units": "km"}),
+                "y": ("y", y, {"units": "km"}),
+            },
+        )
+        ds["proj"] = xr.DataArray(
+            0,
+            attrs={
+                "grid_mapping_name": "albers_conical_equal_area",
+                "longitude_of_central_meridian": 153.24,
+                "latitude_of_projection_origin": -27.718,
+                "standard_parallel": [-26.2, -29.3],
+            },
+        )
+    else:
+        x = np.arange(n_cols) * 1300.0
+        y = -np.arange(n_rows) * 1300.0
+        ds = xr.Dataset(
+            {"precipitation": (dims, rates, {"units": "kg m-2"})},
+            coords={
+                "time": times,
+                "x": ("x", x, {"units": "m"}),
+                "y": ("y", y, {"units": "m"}),
+            },
+            attrs={"proj4string": "+proj=lcc +lon_0=4.55 +lat_1=50.8 +lat_2=50.8"},
+        )
+
+    for i in range(n_extra_variables):
+        extra = da.random.RandomState(seed + i + 1).random(shape, chunks=chunks)
+        ds[f"extra_{i:03d}"] = (dims, extra.astype("float32"), {"units": "1"})
+
+    return ds
+
+
+def write_synthetic_nwp_file(
+    path, layout, chunksizes=None, complevel=0, packed=False, **kwargs
+):
+    """Write a synthetic NWP file with the layout of the KNMI, BoM or RMI files.
+
+    Parameters
+    ----------
+    path: str
+        Name of the file to write.
+    layout: {"knmi", "bom", "rmi"}
+        Layout of the file.
+    chunksizes: tuple, optional
+        Chunk sizes of the fields in the file. Defaults to one chunk per time
+        step, or to contiguous variables if complevel is 0.
+    complevel: int
+        Compression level (zlib) of the fields, from 0 (no compression) to 9.
+    packed: bool
+        If True, the precipitation is packed in 16-bit integers with a
+        scale_factor and an add_offset, like many operational files.
+    kwargs
+        Keywords passed to :py:func:`synthetic_nwp_dataset`.
+
+    Returns
+    -------
+    path: str
+        Name of the written file.
+    """
+    ds = synthetic_nwp_dataset(layout, **kwargs)
+    # the precipitation is the first field
+    fields = [name for name in ds.data_vars if ds[name].ndim > 1]
+    varname = fields[0]
+
+    encoding = {}
+    if complevel > 0:
+        encoding.update(zlib=True, complevel=complevel)
+        if chunksizes is None:
+            chunksizes = tuple(chunks[0] for chunks in ds[varname].chunks)
+    if chunksizes is not None:
+        encoding["chunksizes"] = tuple(chunksizes)
+
+    encodings = {name: encoding for name in fields}
+    if packed:
+        encodings[varname] = dict(encoding, **PACKING)
+    ds.to_netcdf(path, encoding=encodings)
+    return str(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic NWP file.")
+    parser.add_argument("layout", choices=LAYOUTS)
+    parser.add_argument("path")
+    parser.add_argument("--n-leadtimes", type=int, default=7)
+    parser.add_argument("--n-rows", type=int, default=20)
+    parser.add_argument("--n-cols", type=int, default=24)
+    parser.add_argument("--timestep", type=int, help="time step in minutes")
+    parser.add_argument("--n-members", type=int)
+    parser.add_argument("--n-extra-variables", type=int, default=0)
+    parser.add_argument("--complevel", type=int, default=0)
+    parser.add_argument("--packed", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    write_synthetic_nwp_file(
+        args.path,
+        args.layout,
+        complevel=args.complevel,
+        packed=args.packed,
+        n_leadtimes=args.n_leadtimes,
+        n_rows=args.n_rows,
+        n_cols=args.n_cols,
+        timestep=args.timestep,
+        n_members=args.n_members,
+        n_extra_variables=args.n_extra_variables,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
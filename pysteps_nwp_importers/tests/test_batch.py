@@ -0,0 +1,136 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from pysteps import io
+from pysteps_nwp_importers.batch import SHM_DIR, backfill_nwp, import_nwp_batch
+from pysteps_nwp_importers.dataset_pool import DatasetPool
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp
+
+pytest.importorskip("netCDF4")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+
+
+def _copy_runs(filename, tmp_path, n_runs=3):
+    filenames = []
+    for i in range(n_runs):
+        filenames.append(str(tmp_path / f"run_{i}.nc"))
+        shutil.copy(filename, filenames[-1])
+    return filenames
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_import_nwp_batch(synthetic_files, tmp_path, layout):
+    importer = IMPORTERS[layout]
+    filenames = _copy_runs(synthetic_files[layout], tmp_path)
+    precip, _, metadata = importer(synthetic_files[layout])
+
+    batch_precip, quality, metadata_list = import_nwp_batch(
+        importer, filenames, max_workers=2
+    )
+
+    assert quality is None
+    assert batch_precip.shape == (len(filenames),) + precip.shape
+    assert batch_precip.dtype == precip.dtype
+    for i in range(len(filenames)):
+        np.testing.assert_array_equal(batch_precip[i], precip)
+    assert len(metadata_list) == len(filenames)
+    assert metadata_list[-1]["x1"] == metadata["x1"]
+
+
+def test_import_nwp_batch_decodes_into_output(synthetic_files, tmp_path):
+    filenames = _copy_runs(synthetic_files["knmi"], tmp_path)
+    calls = []
+
+    def importer(filename, **kwargs):
+        calls.append(kwargs)
+        return import_knmi_nwp(filename, **kwargs)
+
+    importer.__module__ = import_knmi_nwp.__module__
+    importer.__name__ = import_knmi_nwp.__name__
+
+    pool = DatasetPool(maxsize=0)
+    batch_precip, _, _ = import_nwp_batch(importer, filenames, pool=pool)
+
+    # every run, the first included, is decoded once into the batch array
+    outs = [kwargs["out"] for kwargs in calls if not kwargs.get("lazy", False)]
+    assert len(outs) == len(filenames)
+    assert all(np.shares_memory(out, batch_precip) for out in outs)
+
+    # the shape is taken from a lazy import that decodes no field and closes
+    # its dataset
+    (lazy_kwargs,) = [kwargs for kwargs in calls if kwargs.get("lazy", False)]
+    assert lazy_kwargs["compute_threshold"] is False
+    assert lazy_kwargs["pool"] is not pool
+    assert len(lazy_kwargs["pool"]) == 0
+
+
+def test_import_nwp_batch_pysteps_importer(synthetic_files, tmp_path):
+    importer = io.get_method("rmi_nwp", "importer")
+    filenames = _copy_runs(synthetic_files["rmi"], tmp_path, n_runs=2)
+
+    batch_precip, _, _ = import_nwp_batch(importer, filenames, dtype="float64")
+
+    assert batch_precip.dtype == np.float64
+    np.testing.assert_array_equal(
+        batch_precip[1], import_rmi_nwp(synthetic_files["rmi"], dtype="float64")[0]
+    )
+
+
+def test_import_nwp_batch_different_grids(synthetic_file_factory, monkeypatch):
+    filenames = [
+        synthetic_file_factory("knmi"),
+        synthetic_file_factory("knmi", n_cols=30),
+    ]
+    decoded = []
+    monkeypatch.setattr(
+        "pysteps_nwp_importers.utils.load_array",
+        lambda *args, **kwargs: decoded.append(args),
+    )
+
+    with pytest.raises(ValueError, match="grid"):
+        import_nwp_batch(import_knmi_nwp, filenames)
+    assert decoded == []
+
+    with pytest.raises(ValueError):
+        import_nwp_batch(import_knmi_nwp, filenames[:1], lazy=True)
+
+
+@pytest.mark.parametrize("to_file", [False, True])
+def test_backfill_nwp(synthetic_file_factory, tmp_path, to_file):
+    # runs with different values to check the order of the output
+    filenames = []
+    with xr.open_dataset(synthetic_file_factory("bom", n_rows=30)) as ds:
+        for i in range(4):
+            filenames.append(str(tmp_path / f"run_{i}.nc"))
+            ds.assign(accum_prcp=ds.accum_prcp * (i + 1)).to_netcdf(filenames[-1])
+    output = str(tmp_path / "backfill.npy") if to_file else None
+    calls = []
+
+    precip, _, metadata_list = backfill_nwp(
+        import_bom_nwp,
+        filenames,
+        output=output,
+        n_workers=2,
+        progress=lambda n_done, n_total: calls.append((n_done, n_total)),
+    )
+    expected, _, _ = import_nwp_batch(import_bom_nwp, filenames)
+
+    np.testing.assert_array_equal(precip, expected)
+    np.testing.assert_allclose(precip[3], 4 * precip[0], rtol=1e-5)
+    assert precip.dtype == np.float32
+    assert calls == [(i, 4) for i in range(1, 5)]
+    assert len(metadata_list) == 4
+    if to_file:
+        assert isinstance(precip, np.memmap)
+        np.testing.assert_array_equal(np.load(output), expected)
+    elif os.path.isdir(SHM_DIR):
+        # the shared memory is returned without a copy, and already unlinked
+        assert isinstance(precip, np.memmap)
+        assert not os.path.exists(precip.filename)
@@ -0,0 +1,114 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from pysteps import io
+from pysteps_nwp_importers import importer_rmi_nwp
+from pysteps_nwp_importers.cache import DecodedCache
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp
+
+pytest.importorskip("netCDF4")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+
+
+@pytest.fixture
+def count_decodes(monkeypatch):
+    decoded = []
+    import_xr = importer_rmi_nwp._import_rmi_nwp_xr
+
+    def _import_rmi_nwp_xr(ds, **kwargs):
+        decoded.append(kwargs)
+        return import_xr(ds, **kwargs)
+
+    monkeypatch.setattr(importer_rmi_nwp, "_import_rmi_nwp_xr", _import_rmi_nwp_xr)
+    return decoded
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_cached_import(synthetic_files, tmp_path, layout):
+    importer = IMPORTERS[layout]
+    cache = DecodedCache(tmp_path)
+    precip, _, metadata = importer(synthetic_files[layout])
+
+    for _ in range(2):
+        cached_precip, quality, cached_metadata = importer(
+            synthetic_files[layout], cache=cache
+        )
+        assert isinstance(cached_precip, np.memmap)
+        assert not cached_precip.flags.writeable
+        assert quality is None
+        np.testing.assert_array_equal(cached_precip, precip)
+        np.testing.assert_array_equal(
+            cached_metadata["time_stamps"], metadata["time_stamps"]
+        )
+        assert cached_metadata["x1"] == metadata["x1"]
+    assert cache.size() == precip.nbytes + cached_precip.offset
+
+
+def test_cache_hit_timings(synthetic_files, tmp_path):
+    cache = DecodedCache(tmp_path)
+    reports = []
+    for _ in range(2):
+        precip, _, _ = import_knmi_nwp(
+            synthetic_files["knmi"], cache=cache, timings_callback=reports.append
+        )
+
+    assert len(reports) == 2
+    # the file is decoded on the miss and loaded from the cache on the hit
+    assert "decode" in reports[0] and "cache_hit" not in reports[0]
+    assert set(reports[1]) == {"cache_hit", "file_size", "nbytes"}
+    assert reports[1]["nbytes"] == precip.nbytes
+
+
+def test_cache_key(synthetic_files, tmp_path, count_decodes):
+    filename = str(tmp_path / "rmi.nc")
+    shutil.copy(synthetic_files["rmi"], filename)
+    cache = DecodedCache(tmp_path / "cache")
+
+    import_rmi_nwp(filename, cache=cache)
+    import_rmi_nwp(filename, cache=cache, prefetch=2)
+    assert len(count_decodes) == 1
+
+    precip, _, _ = import_rmi_nwp(filename, cache=cache, dtype="float64")
+    assert precip.dtype == np.float64
+    assert len(count_decodes) == 2
+
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    import_rmi_nwp(filename, cache=cache)
+    assert len(count_decodes) == 3
+
+    cache.invalidate(filename)
+    assert cache.size() == 0
+    import_rmi_nwp(filename, cache=cache)
+    assert len(count_decodes) == 4
+
+
+def test_cache_eviction(synthetic_files, tmp_path):
+    precip, _, _ = import_knmi_nwp(synthetic_files["knmi"])
+    # room for two entries, including the .npy headers
+    cache = DecodedCache(tmp_path, max_bytes=2 * precip.nbytes + 300)
+
+    for start_time in ("2018-09-05 07:00", "2018-09-05 08:00"):
+        import_knmi_nwp(synthetic_files["knmi"], cache=cache, start_time=start_time)
+    assert len(os.listdir(tmp_path)) == 4
+
+    import_knmi_nwp(synthetic_files["knmi"], cache=cache)
+    assert len(os.listdir(tmp_path)) == 4
+    assert cache.size() <= cache.max_bytes
+
+    cache.clear()
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_through_pysteps(synthetic_files, tmp_path):
+    importer = io.get_method("bom_nwp", "importer")
+    cache = DecodedCache(tmp_path)
+    importer(synthetic_files["bom"], cache=cache)
+    precip, _, _ = importer(synthetic_files["bom"], cache=cache)
+    np.testing.assert_array_equal(precip, import_bom_nwp(synthetic_files["bom"])[0])
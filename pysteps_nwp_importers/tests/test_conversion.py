@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp, iter_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp, iter_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp, iter_rmi_nwp
+
+pytest.importorskip("netCDF4")
+dask_array = pytest.importorskip("dask.array")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+ITERATORS = dict(knmi=iter_knmi_nwp, bom=iter_bom_nwp, rmi=iter_rmi_nwp)
+
+TRANSFORMS = [
+    dict(to_unit="mm/h"),
+    dict(to_unit="mm/h", transform="dB"),
+    dict(transform="BoxCox"),
+    dict(to_unit="mm/h", transform="BoxCox", boxcox_lambda=0.5),
+]
+
+
+def _pysteps_transform(precip, metadata, to_unit=None, transform=None, **kwargs):
+    """Convert and transform precipitation in separate passes with pysteps."""
+    conversion = pytest.importorskip("pysteps.utils.conversion")
+    transformation = pytest.importorskip("pysteps.utils.transformation")
+    precip = precip.copy()
+    if to_unit == "mm/h":
+        precip, metadata = conversion.to_rainrate(precip, metadata)
+    if transform is not None and not metadata["threshold"] > 0:
+        # e.g. the threshold of the first accumulation of the BoM files
+        metadata = dict(metadata, threshold=0.1)
+    if transform == "dB":
+        precip, metadata = transformation.dB_transform(precip, metadata)
+    elif transform == "BoxCox":
+        precip, metadata = transformation.boxcox_transform(
+            precip, metadata, Lambda=kwargs.get("boxcox_lambda", 0.0)
+        )
+    return precip, metadata
+
+
+@pytest.mark.parametrize("kwargs", TRANSFORMS)
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_convert_on_read(synthetic_files, layout, kwargs):
+    importer = IMPORTERS[layout]
+    precip, _, metadata = importer(synthetic_files[layout])
+    expected, expected_metadata = _pysteps_transform(precip, metadata, **kwargs)
+
+    converted, _, converted_metadata = importer(synthetic_files[layout], **kwargs)
+    assert converted.dtype == precip.dtype
+    np.testing.assert_allclose(converted, expected, rtol=1e-5, atol=1e-5)
+    for key in ("unit", "transform", "threshold", "zerovalue"):
+        assert converted_metadata[key] == pytest.approx(expected_metadata[key])
+
+    lazy, _, _ = importer(synthetic_files[layout], lazy=True, **kwargs)
+    assert isinstance(lazy, dask_array.Array)
+    np.testing.assert_allclose(lazy.compute(), converted, rtol=1e-6)
+
+    out = np.empty_like(converted)
+    assert importer(synthetic_files[layout], out=out, **kwargs)[0] is out
+    np.testing.assert_array_equal(out, converted)
+
+    steps = list(ITERATORS[layout](synthetic_files[layout], **kwargs))
+    np.testing.assert_allclose(
+        np.stack([field for _, field, _ in steps]), converted, rtol=1e-6
+    )
+    assert steps[0][2]["threshold"] == converted_metadata["threshold"]
+
+
+def test_convert_after_interpolation(synthetic_files):
+    kwargs = dict(to_unit="mm/h", transform="dB")
+    precip, _, metadata = import_bom_nwp(synthetic_files["bom"], target_timestep=5)
+    expected, expected_metadata = _pysteps_transform(precip, metadata, **kwargs)
+
+    converted, _, converted_metadata = import_bom_nwp(
+        synthetic_files["bom"], target_timestep=5, **kwargs
+    )
+    np.testing.assert_allclose(converted, expected, rtol=1e-5, atol=1e-5)
+    assert converted_metadata["accutime"] == 5
+    assert converted_metadata["threshold"] == pytest.approx(
+        expected_metadata["threshold"]
+    )
+
+
+def test_convert_invalid(synthetic_files):
+    with pytest.raises(ValueError, match="unknown unit"):
+        import_rmi_nwp(synthetic_files["rmi"], to_unit="dBZ")
+    with pytest.raises(ValueError, match="unknown transform"):
+        import_rmi_nwp(synthetic_files["rmi"], transform="sqrt")
@@ -0,0 +1,132 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from pysteps_nwp_importers import dataset_pool
+from pysteps_nwp_importers.dataset_pool import DatasetPool
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp
+
+pytest.importorskip("netCDF4")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+
+
+@pytest.fixture
+def count_opens(monkeypatch):
+    opened = []
+    open_dataset = xr.open_dataset
+
+    def _open_dataset(filename, **kwargs):
+        # the importers open the files from a netCDF4 data store
+        opened.append(getattr(filename, "_filename", filename))
+        return open_dataset(filename, **kwargs)
+
+    monkeypatch.setattr(xr, "open_dataset", _open_dataset)
+    return opened
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_reimport_reuses_open_dataset(synthetic_files, count_opens, layout):
+    with DatasetPool(maxsize=2) as pool:
+        precip, _, metadata = IMPORTERS[layout](synthetic_files[layout], pool=pool)
+        precip_again, _, metadata_again = IMPORTERS[layout](
+            synthetic_files[layout], pool=pool
+        )
+        assert len(pool) == 1
+    assert len(pool) == 0
+
+    assert count_opens == [synthetic_files[layout]]
+    np.testing.assert_array_equal(precip_again, precip)
+    # the pooled dataset is not modified, e.g. by the conversion to meters
+    for key in ("x1", "x2", "xpixelsize", "cartesian_unit"):
+        assert metadata_again[key] == metadata[key]
+
+
+def test_pool_evicts_least_recently_used(synthetic_files, count_opens):
+    pool = DatasetPool(maxsize=2)
+    knmi_ds = pool.open(synthetic_files["knmi"])
+    pool.open(synthetic_files["bom"])
+    assert pool.open(synthetic_files["knmi"]) is knmi_ds
+
+    pool.open(synthetic_files["rmi"])
+    assert len(pool) == 2
+    assert pool.open(synthetic_files["knmi"]) is knmi_ds
+    pool.open(synthetic_files["bom"])
+    assert len(count_opens) == 4
+
+    pool.maxsize = 0
+    assert len(pool) == 0
+
+
+def test_pool_reopens_modified_file(synthetic_files, tmp_path, count_opens):
+    filename = str(tmp_path / "knmi.nc")
+    shutil.copy(synthetic_files["knmi"], filename)
+
+    with DatasetPool() as pool:
+        ds = pool.open(filename)
+        stat = os.stat(filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert pool.open(filename) is not ds
+        assert len(pool) == 1
+
+
+def test_pool_keeps_same_file_opened_with_other_keywords(synthetic_files, count_opens):
+    filename = synthetic_files["knmi"]
+    with DatasetPool() as pool:
+        precip, _, _ = import_knmi_nwp(filename, pool=pool)
+        lazy, _, _ = import_knmi_nwp(filename, pool=pool, lazy=True)
+        import_knmi_nwp(filename, pool=pool)
+        import_knmi_nwp(filename, pool=pool, lazy=True)
+        assert len(pool) == 2
+        assert len(count_opens) == 2
+        # the dataset of the lazy array is still open
+        np.testing.assert_array_equal(lazy.compute(), precip)
+
+
+def test_pool_without_datasets_closes_files(synthetic_files, count_opens):
+    pool = DatasetPool(maxsize=0)
+    import_knmi_nwp(synthetic_files["knmi"], pool=pool)
+    import_knmi_nwp(synthetic_files["knmi"], pool=pool)
+    assert len(pool) == 0
+    assert len(count_opens) == 2
+
+
+def test_close_all_default_pool(synthetic_files):
+    import_rmi_nwp(synthetic_files["rmi"])
+    assert len(dataset_pool.get_pool()) > 0
+    dataset_pool.close_all()
+    assert len(dataset_pool.get_pool()) == 0
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_importers_open_only_used_variables(
+    synthetic_file_factory, monkeypatch, layout
+):
+    filename = synthetic_file_factory(layout, n_extra_variables=3)
+    with xr.open_dataset(filename) as ds:
+        assert "extra_002" in ds
+
+    opened = []
+    open_dataset = xr.open_dataset
+
+    def _open_dataset(filename, **kwargs):
+        ds = open_dataset(filename, **kwargs)
+        opened.append(set(ds.variables))
+        return ds
+
+    monkeypatch.setattr(xr, "open_dataset", _open_dataset)
+    precip, _, metadata = IMPORTERS[layout](filename, pool=DatasetPool(maxsize=0))
+    (variables,) = opened
+    assert not any(name.startswith("extra") for name in variables)
+    assert {"time", "x", "y"} <= variables
+    assert metadata["projection"]
+
+    expected, _, _ = IMPORTERS[layout](
+        synthetic_file_factory(layout), pool=DatasetPool(maxsize=0)
+    )
+    np.testing.assert_array_equal(precip, expected)
@@ -0,0 +1,90 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp, iter_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp, iter_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp, iter_rmi_nwp
+from pysteps_nwp_importers.utils import get_zerovalue_threshold
+
+pytest.importorskip("netCDF4")
+dask_array = pytest.importorskip("dask.array")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+ITERATORS = dict(knmi=iter_knmi_nwp, bom=iter_bom_nwp, rmi=iter_rmi_nwp)
+VARNAMES = dict(knmi="P_fc", bom="accum_prcp", rmi="precipitation")
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_ensemble_import(synthetic_file_factory, layout):
+    importer = IMPORTERS[layout]
+    filename = synthetic_file_factory(layout, n_members=4)
+    with xr.open_dataset(filename) as ds:
+        expected = ds[VARNAMES[layout]].values.astype("float32")
+    if layout == "bom":
+        expected = np.diff(expected, axis=1)
+
+    precip, _, metadata = importer(filename)
+    assert precip.shape == expected.shape
+    np.testing.assert_array_equal(precip, expected)
+
+    subset, _, subset_metadata = importer(filename, members=[3, 1])
+    np.testing.assert_array_equal(subset, expected[[3, 1]])
+    np.testing.assert_array_equal(
+        subset_metadata["time_stamps"], metadata["time_stamps"]
+    )
+    assert importer(filename, members=2)[0].shape == (1,) + expected.shape[1:]
+
+    lazy_subset, _, _ = importer(filename, members=[3, 1], lazy=True)
+    assert isinstance(lazy_subset, dask_array.Array)
+    np.testing.assert_array_equal(lazy_subset.compute(), subset)
+
+    for i, (_, field, _) in enumerate(ITERATORS[layout](filename, members=[3, 1])):
+        np.testing.assert_array_equal(field, subset[:, i])
+    assert i == subset.shape[1] - 1
+
+
+def test_ensemble_threshold_of_selected_members(synthetic_file_factory):
+    filename = synthetic_file_factory("rmi", n_members=4)
+    with xr.open_dataset(filename) as ds:
+        first_fields = ds.precipitation[[0, 2], 0].values
+
+    _, _, metadata = import_rmi_nwp(filename, members=[0, 2])
+
+    assert (metadata["zerovalue"], metadata["threshold"]) == get_zerovalue_threshold(
+        first_fields
+    )
+
+
+def test_ensemble_time_first_layout(synthetic_file_factory, tmp_path):
+    filename = str(tmp_path / "knmi_realization.nc")
+    with xr.open_dataset(synthetic_file_factory("knmi", n_members=3)) as ds:
+        ds = ds.rename(member="realization").transpose("time", "realization", ...)
+        ds.to_netcdf(filename)
+        expected = ds.P_fc.transpose("realization", ...).values
+
+    precip, _, _ = import_knmi_nwp(filename, members=[0, 2])
+    np.testing.assert_array_equal(precip, expected[[0, 2]])
+
+    with pytest.raises(ValueError):
+        import_knmi_nwp(filename, varname_member="member")
+    with pytest.raises(ValueError):
+        import_knmi_nwp(synthetic_file_factory("knmi"), members=[0])
+
+
+def test_ensemble_reads_only_selected_members(synthetic_file_factory):
+    filename = synthetic_file_factory(
+        "knmi", n_times=12, n_rows=150, n_cols=160, n_members=6
+    )
+
+    tracemalloc.start()
+    try:
+        precip, _, _ = import_knmi_nwp(filename, members=[4])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert precip.shape == (1, 12, 150, 160)
+    assert peak < 1.5 * precip.nbytes
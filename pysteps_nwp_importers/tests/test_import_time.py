@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("xarray", "netCDF4", "dask", "pandas", "zarr")
+
+
+def _imported_modules(statement):
+    """Return the modules imported by a statement with python -X importtime,
+    with their cumulative import time in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import pysteps_nwp_importers",
+        "from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp",
+        "from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp",
+        "from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp",
+        "from pysteps_nwp_importers.importer_zarr_nwp import import_zarr_nwp",
+    ],
+)
+def test_importers_do_not_import_heavy_modules(statement):
+    modules = _imported_modules(statement)
+
+    assert "pysteps_nwp_importers" in modules
+    assert not [name for name in HEAVY_MODULES if name in modules]
+
+
+def test_package_attributes_are_loaded_on_access():
+    statement = (
+        "import sys, pysteps_nwp_importers; "
+        "assert 'pysteps_nwp_importers.importer_rmi_nwp' not in sys.modules; "
+        "pysteps_nwp_importers.importer_rmi_nwp; "
+        "assert 'pysteps_nwp_importers.importer_rmi_nwp' in sys.modules; "
+        "assert 'pysteps_nwp_importers.importer_bom_nwp' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", statement], check=True)
@@ -0,0 +1,175 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from pysteps_nwp_importers.importer_bom_nwp import (
+    import_bom_nwp,
+    import_bom_nwp_metadata,
+)
+from pysteps_nwp_importers.importer_knmi_nwp import (
+    import_knmi_nwp,
+    import_knmi_nwp_metadata,
+)
+from pysteps_nwp_importers.importer_rmi_nwp import (
+    import_rmi_nwp,
+    import_rmi_nwp_metadata,
+)
+
+pytest.importorskip("netCDF4")
+dask_array = pytest.importorskip("dask.array")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+METADATA_IMPORTERS = dict(
+    knmi=import_knmi_nwp_metadata,
+    bom=import_bom_nwp_metadata,
+    rmi=import_rmi_nwp_metadata,
+)
+
+
+def _assert_same_metadata(metadata, expected_metadata):
+    assert set(metadata.keys()) == set(expected_metadata.keys())
+    for key, expected_value in expected_metadata.items():
+        if isinstance(expected_value, str) or expected_value is None:
+            assert metadata[key] == expected_value
+        else:
+            np.testing.assert_array_equal(metadata[key], expected_value)
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+@pytest.mark.parametrize("lazy_kwargs", [dict(lazy=True), dict(chunks={"time": 2})])
+def test_lazy_import(synthetic_files, layout, lazy_kwargs):
+    importer = IMPORTERS[layout]
+    precip, _, metadata = importer(synthetic_files[layout])
+    lazy_precip, _, lazy_metadata = importer(synthetic_files[layout], **lazy_kwargs)
+
+    assert isinstance(lazy_precip, dask_array.Array)
+    if "chunks" not in lazy_kwargs:
+        assert set(lazy_precip.chunks[0]) == {1}
+    np.testing.assert_array_equal(lazy_precip.compute(), precip)
+    _assert_same_metadata(lazy_metadata, metadata)
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_time_window(synthetic_files, layout):
+    importer = IMPORTERS[layout]
+    precip, _, metadata = importer(synthetic_files[layout])
+    time_stamps = metadata["time_stamps"]
+
+    window_precip, _, window_metadata = importer(
+        synthetic_files[layout], start_time=time_stamps[2], end_time=time_stamps[4]
+    )
+
+    if layout == "bom":
+        # the preceding accumulation is read to disaggregate the first step
+        np.testing.assert_array_equal(window_metadata["time_stamps"], time_stamps[1:5])
+        np.testing.assert_array_equal(window_precip, precip[1:4])
+    else:
+        np.testing.assert_array_equal(window_metadata["time_stamps"], time_stamps[2:5])
+        np.testing.assert_array_equal(window_precip, precip[2:5])
+    assert window_metadata["accutime"] == metadata["accutime"]
+
+
+def test_time_window_outside_file(synthetic_files):
+    with pytest.raises(ValueError):
+        import_knmi_nwp(synthetic_files["knmi"], start_time="2030-01-01")
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_bbox(synthetic_files, layout):
+    importer = IMPORTERS[layout]
+    precip, _, metadata = importer(synthetic_files[layout])
+    n_rows = precip.shape[1]
+    xpix = metadata["xpixelsize"]
+    ypix = metadata["ypixelsize"]
+
+    bbox = (
+        metadata["x1"] + 1.9 * xpix,
+        metadata["y1"] + 2.9 * ypix,
+        metadata["x1"] + 7.1 * xpix,
+        metadata["y1"] + 9.1 * ypix,
+    )
+    bbox_precip, _, bbox_metadata = importer(synthetic_files[layout], bbox=bbox)
+
+    if metadata["yorigin"] == "lower":
+        rows = slice(3, 10)
+    else:
+        rows = slice(n_rows - 10, n_rows - 3)
+    np.testing.assert_array_equal(bbox_precip, precip[:, rows, 2:8])
+    assert bbox_metadata["yorigin"] == metadata["yorigin"]
+    assert bbox_metadata["x1"] == pytest.approx(metadata["x1"] + 2 * xpix)
+    assert bbox_metadata["x2"] == pytest.approx(metadata["x1"] + 7 * xpix)
+    assert bbox_metadata["y1"] == pytest.approx(metadata["y1"] + 3 * ypix)
+    assert bbox_metadata["y2"] == pytest.approx(metadata["y1"] + 9 * ypix)
+    assert bbox_metadata["xpixelsize"] == pytest.approx(xpix)
+
+
+def test_bbox_outside_grid(synthetic_files):
+    with pytest.raises(ValueError):
+        import_rmi_nwp(synthetic_files["rmi"], bbox=(-1e6, -1e6, -9e5, -9e5))
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_dtype(synthetic_files, layout, dtype):
+    precip, _, _ = IMPORTERS[layout](synthetic_files[layout], dtype=dtype)
+    assert precip.dtype == np.dtype(dtype)
+
+    lazy_precip, _, _ = IMPORTERS[layout](
+        synthetic_files[layout], dtype=dtype, lazy=True
+    )
+    assert lazy_precip.dtype == np.dtype(dtype)
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_peak_memory_is_one_output_copy(synthetic_file_factory, layout):
+    filename = synthetic_file_factory(layout, n_times=24, n_rows=150, n_cols=160)
+
+    tracemalloc.start()
+    try:
+        precip, _, _ = IMPORTERS[layout](filename)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert precip.dtype == np.float32
+    assert peak < 1.5 * precip.nbytes
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_metadata_only(synthetic_files, layout):
+    _, _, metadata = IMPORTERS[layout](synthetic_files[layout])
+
+    header_metadata = METADATA_IMPORTERS[layout](synthetic_files[layout])
+    assert header_metadata["zerovalue"] is None
+    assert header_metadata["threshold"] is None
+    header_metadata.update(
+        zerovalue=metadata["zerovalue"], threshold=metadata["threshold"]
+    )
+    _assert_same_metadata(header_metadata, metadata)
+
+    full_metadata = METADATA_IMPORTERS[layout](
+        synthetic_files[layout], compute_threshold=True
+    )
+    _assert_same_metadata(full_metadata, metadata)
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_timings_callback(synthetic_files, layout, caplog, capsys):
+    reports = []
+    with caplog.at_level("DEBUG", logger="pysteps_nwp_importers"):
+        precip, _, _ = IMPORTERS[layout](
+            synthetic_files[layout], timings_callback=reports.append
+        )
+
+    assert len(reports) == 1
+    timings = reports[0]
+    stages = {"open", "header", "threshold"}
+    stages.add("disaggregate" if layout == "bom" else "decode")
+    assert stages <= set(timings)
+    assert all(timings[stage] >= 0.0 for stage in stages)
+    assert timings["nbytes"] == precip.nbytes
+    assert timings["file_size"] > 0
+    assert synthetic_files[layout] in caplog.text
+    # nothing is printed on the standard output
+    assert capsys.readouterr().out == ""
@@ -18,10 +18,19 @@ ImportedData = namedtuple(
 TOLERANCE = defaultdict(lambda: 0.0001)
 TOLERANCE["threshold"] = 0.01
 
-download_test_data()
 DATA_DIR = Path(__file__).parent / "data"
 
 
+@pytest.fixture(scope="module")
+def test_data():
+    """Download the real NWP files, skipping the tests when offline."""
+    try:
+        download_test_data()
+    except OSError as error:
+        # urllib.error.URLError is an OSError
+        pytest.skip(f"the test data cannot be downloaded: {error}")
+
+
 def rmi_imported_data():
     rmi_precip_data, _, metadata_nwp = import_rmi_nwp(
         str(DATA_DIR / "rmi/ao13_2021070412_native_5min.nc")
@@ -358,7 +367,7 @@ def kmni_imported_data():
 @pytest.fixture(
     scope="class", params=(rmi_imported_data, bom_imported_data, kmni_imported_data)
 )
-def imported_data(request):
+def imported_data(request, test_data):
     return request.param()
 
 
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from pysteps_nwp_importers.batch import import_nwp_batch
+from pysteps_nwp_importers.cache import DecodedCache
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp, iter_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp
+from pysteps_nwp_importers.utils import disaggregate_packed, unpack
+
+pytest.importorskip("netCDF4")
+dask_array = pytest.importorskip("dask.array")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_import_packed(synthetic_file_factory, layout):
+    importer = IMPORTERS[layout]
+    filename = synthetic_file_factory(layout, packed=True)
+    precip, _, metadata = importer(filename)
+
+    packed, _, packed_metadata = importer(filename, packed=True)
+    assert packed.dtype == np.int16
+    assert packed.shape == precip.shape
+    assert packed_metadata["scale_factor"] == pytest.approx(0.02)
+    expected_offset = 0.0 if layout == "bom" else 300.0
+    assert packed_metadata["add_offset"] == pytest.approx(expected_offset)
+    assert packed_metadata["fill_value"] == -32767
+    for key in ("zerovalue", "threshold"):
+        assert packed_metadata[key] == pytest.approx(metadata[key], abs=1e-4)
+    np.testing.assert_array_equal(
+        packed_metadata["time_stamps"], metadata["time_stamps"]
+    )
+
+    np.testing.assert_allclose(
+        unpack(packed, packed_metadata), precip, rtol=1e-5, atol=1e-3
+    )
+
+    lazy, _, _ = importer(filename, packed=True, lazy=True)
+    assert isinstance(lazy, dask_array.Array)
+    assert lazy.dtype == np.int16
+    np.testing.assert_array_equal(lazy.compute(), packed)
+    lazy_unpacked = unpack(lazy, packed_metadata)
+    assert isinstance(lazy_unpacked, dask_array.Array)
+    np.testing.assert_array_equal(
+        lazy_unpacked.compute(), unpack(packed, packed_metadata)
+    )
+
+    out = np.empty_like(packed)
+    assert importer(filename, packed=True, out=out)[0] is out
+    np.testing.assert_array_equal(out, packed)
+
+
+def test_unpack_into_buffer():
+    packing = dict(scale_factor=0.5, add_offset=10.0, fill_value=-1)
+    packed = np.array([[[0, 2], [-1, 4]], [[6, -1], [8, 10]]], dtype="int16")
+    out = np.zeros(packed.shape, dtype="float32")
+    assert unpack(packed, packing, out=out) is out
+    expected = np.array(
+        [[[10.0, 11.0], [np.nan, 12.0]], [[13.0, np.nan], [14.0, 15.0]]]
+    )
+    np.testing.assert_array_equal(out, expected)
+
+    with pytest.raises(ValueError, match="shape"):
+        unpack(packed, packing, out=out[:1])
+
+
+def test_disaggregate_packed():
+    accum = np.array([[[0, 5]], [[3, -9]], [[10, 12]], [[9, 13]]], dtype="int16")
+    precip = disaggregate_packed(accum, fill_value=-9, clip_negative=True)
+    assert precip.dtype == np.int16
+    np.testing.assert_array_equal(precip, [[[3, -9]], [[7, -9]], [[0, 1]]])
+
+    lazy = disaggregate_packed(
+        dask_array.from_array(accum, chunks=(1, 1, 2)), -9, clip_negative=True
+    )
+    np.testing.assert_array_equal(lazy.compute(), precip)
+
+    overflow = np.array([[[-30000]], [[30000]]], dtype="int16")
+    with pytest.raises(ValueError, match="packed data type"):
+        disaggregate_packed(overflow)
+
+
+def test_packed_cache_and_batch(synthetic_file_factory, tmp_path):
+    filenames = [
+        synthetic_file_factory("knmi", packed=True, seed=seed) for seed in (1, 2)
+    ]
+    packed, _, metadata = import_knmi_nwp(filenames[0], packed=True)
+
+    # the cache keeps two bytes per grid point
+    cache = DecodedCache(tmp_path)
+    cached, _, cached_metadata = import_knmi_nwp(filenames[0], packed=True, cache=cache)
+    assert cached.dtype == np.int16
+    np.testing.assert_array_equal(cached, packed)
+    assert cached_metadata["scale_factor"] == metadata["scale_factor"]
+    assert cache.size() < packed.size * 4
+
+    batch, _, metadata_list = import_nwp_batch(import_knmi_nwp, filenames, packed=True)
+    assert batch.dtype == np.int16
+    np.testing.assert_array_equal(batch[0], packed)
+    assert len(metadata_list) == 2
+
+
+def test_packed_invalid(synthetic_files):
+    with pytest.raises(ValueError, match="to_unit cannot be used with packed"):
+        import_rmi_nwp(synthetic_files["rmi"], packed=True, to_unit="mm/h")
+    with pytest.raises(ValueError, match="iterators"):
+        next(iter_bom_nwp(synthetic_files["bom"], packed=True))
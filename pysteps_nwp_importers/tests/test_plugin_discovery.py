@@ -1,8 +1,12 @@
 import pytest
 from pysteps.io import interface
 
-
-new_importers = ["import_bom_nwp", "import_knmi_nwp", "import_rmi_nwp"]
+new_importers = [
+    "import_bom_nwp",
+    "import_knmi_nwp",
+    "import_rmi_nwp",
+    "import_zarr_nwp",
+]
 
 
 @pytest.mark.parametrize("importer_name", new_importers)
@@ -12,3 +16,11 @@ def test_importers_discovery(importer_name):
     against the plugin sources).
     """
     assert importer_name.replace("import_", "") in interface._importer_methods
+
+
+@pytest.mark.parametrize("layout", ["bom", "knmi", "rmi"])
+def test_importers_keep_float32(synthetic_files, layout):
+    """Check that pysteps does not cast the data to float64 by default."""
+    importer = interface.get_method(f"{layout}_nwp", "importer")
+    precip, _, _ = importer(synthetic_files[layout])
+    assert precip.dtype == "float32"
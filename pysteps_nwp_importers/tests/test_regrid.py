@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+import pytest
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp
+from pysteps_nwp_importers.regrid import _get_weights, get_regrid_weights, regrid
+
+pytest.importorskip("netCDF4")
+pytest.importorskip("pyproj")
+pytest.importorskip("scipy")
+dask_array = pytest.importorskip("dask.array")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+
+
+def _target_grid(metadata, shift=(0, 0), step=1, shape=None):
+    """Grid in the pysteps format, shifted and subsampled from the grid of
+    the metadata, with x1, y1, x2 and y2 at the corners of the raster."""
+    xpixelsize = metadata["xpixelsize"] * step
+    ypixelsize = metadata["ypixelsize"] * step
+    x1 = metadata["x1"] + shift[0] * metadata["xpixelsize"] - xpixelsize / 2
+    y1 = metadata["y1"] + shift[1] * metadata["ypixelsize"] - ypixelsize / 2
+    n_rows, n_cols = shape
+    return dict(
+        projection=metadata["projection"],
+        x1=x1,
+        y1=y1,
+        x2=x1 + n_cols * xpixelsize,
+        y2=y1 + n_rows * ypixelsize,
+        xpixelsize=xpixelsize,
+        ypixelsize=ypixelsize,
+        yorigin=metadata["yorigin"],
+        cartesian_unit=metadata["cartesian_unit"],
+    )
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_regrid_same_grid(synthetic_files, tmp_path, layout):
+    importer = IMPORTERS[layout]
+    precip, _, metadata = importer(synthetic_files[layout])
+    target_grid = _target_grid(metadata, shape=precip.shape[1:])
+
+    regridded, _, regridded_metadata = importer(
+        synthetic_files[layout], target_grid=target_grid, weights_dir=tmp_path
+    )
+    assert regridded.dtype == precip.dtype
+    np.testing.assert_allclose(regridded, precip, rtol=1e-5, atol=1e-5)
+    for key in ("x1", "x2", "y1", "y2", "xpixelsize", "ypixelsize"):
+        assert np.isclose(regridded_metadata[key], metadata[key])
+    np.testing.assert_array_equal(
+        regridded_metadata["time_stamps"], metadata["time_stamps"]
+    )
+
+
+def test_regrid_shifted_grid(synthetic_files, tmp_path):
+    precip, _, metadata = import_rmi_nwp(synthetic_files["rmi"])
+    n_rows, n_cols = precip.shape[1:]
+
+    # half a grid point to the right, and a coarser grid extending beyond
+    # the source grid
+    target_grid = _target_grid(metadata, shift=(0.5, 0), shape=(n_rows, n_cols))
+    regridded, _ = regrid(precip, metadata, target_grid, tmp_path)
+    expected = (precip[..., :-1] + precip[..., 1:]) / 2
+    np.testing.assert_allclose(regridded[..., :-1], expected, rtol=1e-5, atol=1e-5)
+    assert np.isnan(regridded[..., -1]).all()
+
+    target_grid = _target_grid(metadata, step=2, shape=(n_rows, n_cols))
+    regridded, regridded_metadata = regrid(precip, metadata, target_grid, tmp_path)
+    assert regridded.shape == precip.shape
+    assert regridded_metadata["xpixelsize"] == 2 * metadata["xpixelsize"]
+    # the target grid starts at the lower left grid point of the source grid
+    if metadata["yorigin"] == "upper":
+        precip, regridded = precip[..., ::-1, :], regridded[..., ::-1, :]
+    n_inside = (n_rows + 1) // 2, (n_cols + 1) // 2
+    np.testing.assert_array_equal(
+        regridded[..., : n_inside[0], : n_inside[1]], precip[..., ::2, ::2]
+    )
+    assert np.isnan(regridded[..., n_inside[0] :, :]).all()
+    assert np.isnan(regridded[..., n_inside[1] :]).all()
+
+
+def test_regrid_weights_cached_on_disk(synthetic_files, tmp_path):
+    precip, _, metadata = import_knmi_nwp(synthetic_files["knmi"])
+    target_grid = _target_grid(metadata, shift=(0.3, 0.6), shape=(10, 12))
+
+    weights, valid, target_shape = get_regrid_weights(
+        metadata, precip.shape[1:], target_grid, tmp_path
+    )
+    assert target_shape == (10, 12)
+    assert weights.shape == (valid.size, precip[0].size)
+    np.testing.assert_allclose(weights.sum(axis=1).A1[valid], 1.0)
+    (cached,) = os.listdir(tmp_path)
+    assert cached.endswith(".npz")
+
+    # the weights are read from the file by a new process, simulated here by
+    # clearing the cache in memory
+    _get_weights.cache_clear()
+    mtime = os.stat(tmp_path / cached).st_mtime_ns
+    cached_weights, cached_valid, _ = get_regrid_weights(
+        metadata, precip.shape[1:], target_grid, tmp_path
+    )
+    assert os.stat(tmp_path / cached).st_mtime_ns == mtime
+    assert (cached_weights != weights).nnz == 0
+    np.testing.assert_array_equal(cached_valid, valid)
+
+
+def test_regrid_lazy_and_out(synthetic_files, tmp_path):
+    precip, _, metadata = import_bom_nwp(synthetic_files["bom"])
+    target_grid = _target_grid(metadata, shift=(1.5, 2.5), shape=(8, 9))
+    expected, _, expected_metadata = import_bom_nwp(
+        synthetic_files["bom"], target_grid=target_grid, weights_dir=tmp_path
+    )
+    assert expected.shape == (precip.shape[0], 8, 9)
+
+    lazy, _, lazy_metadata = import_bom_nwp(
+        synthetic_files["bom"],
+        target_grid=target_grid,
+        weights_dir=tmp_path,
+        lazy=True,
+    )
+    assert isinstance(lazy, dask_array.Array)
+    assert lazy.shape == expected.shape
+    np.testing.assert_array_equal(lazy.compute(), expected)
+    assert lazy_metadata["x1"] == expected_metadata["x1"]
+
+    out = np.empty(expected.shape, dtype="float32")
+    result, _, _ = import_bom_nwp(
+        synthetic_files["bom"], target_grid=target_grid, weights_dir=tmp_path, out=out
+    )
+    assert result is out
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_regrid_float32_into_out(synthetic_files, tmp_path):
+    precip, _, metadata = import_knmi_nwp(synthetic_files["knmi"])
+    target_grid = _target_grid(metadata, shift=(1.5, 2.5), shape=(8, 9))
+    weights, valid, _ = get_regrid_weights(
+        metadata, precip.shape[-2:], target_grid, tmp_path
+    )
+    fields = precip.reshape(precip.shape[0], -1).astype("float64")
+    expected = (weights @ fields.T).T
+    expected[:, ~valid] = np.nan
+    expected = expected.reshape(precip.shape[:1] + (8, 9))
+
+    # the output array does not need to be contiguous
+    out = np.empty((precip.shape[0], 9, 8), dtype="float32").transpose(0, 2, 1)
+    regridded, _ = regrid(precip, metadata, target_grid, tmp_path, out=out)
+    assert regridded is out
+    np.testing.assert_allclose(out, expected, rtol=1e-5, atol=1e-5)
+
+    with pytest.raises(ValueError, match="shape"):
+        regrid(precip, metadata, target_grid, tmp_path, out=out[1:])
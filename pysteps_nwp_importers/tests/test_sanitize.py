@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp, iter_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp, iter_rmi_nwp
+from pysteps_nwp_importers.tests.synthetic_data import synthetic_nwp_dataset
+from pysteps_nwp_importers.utils import Sanitizer
+
+pytest.importorskip("netCDF4")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, rmi=import_rmi_nwp)
+ITERATORS = dict(knmi=iter_knmi_nwp, rmi=iter_rmi_nwp)
+VARNAMES = dict(knmi="P_fc", rmi="precipitation")
+
+
+@pytest.fixture(scope="module")
+def dirty_files(tmp_path_factory):
+    """Synthetic files with negative values and fill values."""
+    tmp_dir = tmp_path_factory.mktemp("dirty_nwp")
+    paths = {}
+    for layout, varname in VARNAMES.items():
+        ds = synthetic_nwp_dataset(layout).load()
+        values = ds[varname].values
+        values[1, 2, 3] = -0.5
+        values[3, :2, :] = -1e-3
+        values[2, 4, 5:8] = np.nan
+        paths[layout] = str(tmp_dir / f"{layout}_dirty.nc")
+        ds.to_netcdf(paths[layout], encoding={varname: {"_FillValue": -9999.0}})
+    return paths
+
+
+@pytest.mark.parametrize("mode", ["negative", "all"])
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_sanitize(dirty_files, layout, mode):
+    importer = IMPORTERS[layout]
+    raw, _, metadata = importer(dirty_files[layout])
+    assert "n_sanitized" not in metadata
+    negative = raw < 0
+    missing = np.isnan(raw)
+    assert negative.sum() == 49 and missing.sum() == 3
+
+    expected = np.where(negative, 0.0, raw)
+    n_expected = negative.sum()
+    if mode == "all":
+        expected[missing] = 0.0
+        n_expected += missing.sum()
+
+    precip, _, metadata = importer(dirty_files[layout], sanitize=mode)
+    np.testing.assert_array_equal(precip, expected)
+    assert metadata["n_sanitized"] == n_expected
+    assert metadata["zerovalue"] == 0.0
+
+    out = np.full_like(raw, -1.0)
+    assert importer(dirty_files[layout], sanitize=mode, out=out)[0] is out
+    np.testing.assert_array_equal(out, expected)
+
+    lazy, _, lazy_metadata = importer(dirty_files[layout], sanitize=mode, lazy=True)
+    np.testing.assert_array_equal(lazy.compute(), expected)
+    assert lazy_metadata["n_sanitized"] is None
+
+    fields = [
+        field for _, field, _ in ITERATORS[layout](dirty_files[layout], sanitize=mode)
+    ]
+    np.testing.assert_array_equal(np.stack(fields), expected)
+
+
+def test_sanitize_before_transform(dirty_files):
+    precip, _, metadata = import_rmi_nwp(
+        dirty_files["rmi"], sanitize="all", transform="dB"
+    )
+    assert np.isfinite(precip).all()
+    assert precip.min() == metadata["zerovalue"]
+    assert metadata["n_sanitized"] == 52
+
+
+def test_sanitizer_counts():
+    sanitizer = Sanitizer("all", zerovalue=0.1)
+    field = np.array([[-1.0, np.nan], [2.0, -0.0]], dtype="float32")
+    assert sanitizer(field) is field
+    np.testing.assert_allclose(field, [[0.0, 0.1], [2.0, 0.0]])
+    assert sanitizer.count == 2
+    with pytest.raises(ValueError, match="sanitize mode"):
+        Sanitizer("nan")
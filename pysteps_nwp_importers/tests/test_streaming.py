@@ -0,0 +1,107 @@
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp, iter_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp, iter_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp, iter_rmi_nwp
+from pysteps_nwp_importers.utils import prefetch
+
+pytest.importorskip("netCDF4")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+ITERATORS = dict(knmi=iter_knmi_nwp, bom=iter_bom_nwp, rmi=iter_rmi_nwp)
+
+
+@pytest.mark.parametrize("layout", ITERATORS.keys())
+def test_iter_matches_import(synthetic_files, layout):
+    precip, _, metadata = IMPORTERS[layout](synthetic_files[layout])
+
+    time_stamps, fields = [], []
+    for time_stamp, field, field_metadata in ITERATORS[layout](synthetic_files[layout]):
+        assert field.dtype == np.float32
+        assert field_metadata["accutime"] == metadata["accutime"]
+        time_stamps.append(time_stamp)
+        fields.append(field)
+
+    np.testing.assert_array_equal(np.stack(fields), precip)
+    # fields of accumulated data are valid at the end of the accumulation
+    np.testing.assert_array_equal(
+        time_stamps, metadata["time_stamps"][-precip.shape[0] :]
+    )
+
+
+@pytest.mark.parametrize("layout", ITERATORS.keys())
+def test_iter_memory_is_flat(synthetic_file_factory, layout):
+    filename = synthetic_file_factory(layout, n_times=40, n_rows=120, n_cols=100)
+    field_nbytes = 120 * 100 * 4
+
+    tracemalloc.start()
+    try:
+        for _ in ITERATORS[layout](filename):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < 8 * field_nbytes
+
+
+@pytest.mark.parametrize("layout", ITERATORS.keys())
+def test_iter_prefetch(synthetic_files, layout):
+    expected = list(ITERATORS[layout](synthetic_files[layout]))
+    prefetched = list(ITERATORS[layout](synthetic_files[layout], prefetch=2))
+
+    assert len(prefetched) == len(expected)
+    for (time_stamp, field, _), (expected_time_stamp, expected_field, _) in zip(
+        prefetched, expected
+    ):
+        assert time_stamp == expected_time_stamp
+        np.testing.assert_array_equal(field, expected_field)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(lazy=True),
+        dict(chunks={}),
+        dict(out=np.empty(0)),
+        dict(cache="cache_dir"),
+        dict(target_grid={}),
+        dict(packed=True),
+    ],
+)
+def test_iter_rejects_whole_file_kwargs(synthetic_files, kwargs):
+    (name,) = kwargs
+    with pytest.raises(ValueError, match=f"{name} is not supported"):
+        next(iter_knmi_nwp(synthetic_files["knmi"], **kwargs))
+
+
+def test_prefetch_stops_when_consumer_stops():
+    produced = []
+
+    def _items():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    items = prefetch(_items(), n_prefetch=3)
+    assert next(items) == 0
+    items.close()
+
+    assert not any(thread.name == "prefetch" for thread in threading.enumerate())
+    # the items read ahead are bounded
+    assert len(produced) <= 6
+
+
+def test_prefetch_raises_producer_errors():
+    def _items():
+        yield 1
+        raise RuntimeError("corrupted field")
+
+    items = prefetch(_items(), n_prefetch=2)
+    assert next(items) == 1
+    with pytest.raises(RuntimeError, match="corrupted field"):
+        next(items)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp
+from pysteps_nwp_importers.tests.synthetic_data import (
+    main,
+    synthetic_nwp_dataset,
+)
+
+pytest.importorskip("netCDF4")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_synthetic_file_layout(synthetic_file_factory, layout):
+    filename = synthetic_file_factory(
+        layout, n_times=5, n_rows=12, n_cols=10, timestep=15, complevel=4
+    )
+    precip, _, metadata = IMPORTERS[layout](filename)
+
+    n_times = 4 if layout == "bom" else 5
+    assert precip.shape == (n_times, 12, 10)
+    assert metadata["accutime"] == 15
+    assert metadata["yorigin"] == ("lower" if layout == "knmi" else "upper")
+    assert metadata["projection"] is not None
+    assert np.all(precip >= 0.0) and np.any(precip > 0.0)
+
+    with xr.open_dataset(filename) as ds:
+        varname = list(ds.data_vars)[0]
+        assert ds[varname].encoding["zlib"]
+        assert ds[varname].encoding["chunksizes"] == (1, 12, 10)
+
+
+def test_synthetic_ensemble_and_command_line(tmp_path):
+    ds = synthetic_nwp_dataset("rmi", n_leadtimes=3, n_members=4)
+    assert ds.precipitation.dims == ("member", "time", "y", "x")
+    assert ds.precipitation.shape == (4, 3, 20, 24)
+    # the fields are reproducible
+    np.testing.assert_array_equal(
+        ds.precipitation.values,
+        synthetic_nwp_dataset("rmi", n_leadtimes=3, n_members=4).precipitation,
+    )
+
+    filename = str(tmp_path / "knmi.nc")
+    main(["knmi", filename, "--n-leadtimes", "3", "--n-rows", "8"])
+    assert import_knmi_nwp(filename)[0].shape == (3, 8, 24)
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp, iter_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp, iter_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp, iter_rmi_nwp
+from pysteps_nwp_importers.temporal import interpolate_time
+
+pytest.importorskip("netCDF4")
+dask_array = pytest.importorskip("dask.array")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+ITERATORS = dict(knmi=iter_knmi_nwp, bom=iter_bom_nwp, rmi=iter_rmi_nwp)
+
+
+@pytest.mark.parametrize("layout", ["knmi", "bom"])
+def test_target_timestep_split(synthetic_files, layout):
+    importer = IMPORTERS[layout]
+    precip, _, metadata = importer(synthetic_files[layout])
+    n_steps = metadata["accutime"] // 5
+
+    split, _, split_metadata = importer(synthetic_files[layout], target_timestep=5)
+    assert split.dtype == precip.dtype
+    assert split.shape == (precip.shape[0] * n_steps,) + precip.shape[1:]
+    assert split_metadata["accutime"] == 5
+    assert split_metadata["threshold"] == pytest.approx(metadata["threshold"] / n_steps)
+
+    # the precipitation is conserved
+    totals = split.reshape((precip.shape[0], n_steps) + precip.shape[1:]).sum(1)
+    np.testing.assert_allclose(totals, precip, rtol=1e-5, atol=1e-6)
+
+    # the time steps end at the time stamps of the file
+    time_stamps = split_metadata["time_stamps"]
+    n_before = time_stamps.size - split.shape[0]
+    assert n_before == metadata["time_stamps"].size - precip.shape[0]
+    np.testing.assert_array_equal(
+        time_stamps[n_before + n_steps - 1 :: n_steps],
+        metadata["time_stamps"][n_before:],
+    )
+    assert (np.diff(time_stamps) == np.timedelta64(5, "m")).all()
+
+
+@pytest.mark.parametrize("layout", ["knmi", "bom"])
+def test_target_timestep_linear(synthetic_files, layout):
+    importer = IMPORTERS[layout]
+    precip, _, metadata = importer(synthetic_files[layout])
+    n_steps = metadata["accutime"] // 5
+
+    linear, _, linear_metadata = importer(
+        synthetic_files[layout], target_timestep=5, time_interpolation="linear"
+    )
+    assert linear.shape == ((precip.shape[0] - 1) * n_steps + 1,) + precip.shape[1:]
+    np.testing.assert_allclose(
+        linear[::n_steps], precip / n_steps, rtol=1e-5, atol=1e-6
+    )
+    if n_steps % 2 == 0:
+        middle = (precip[:-1] + precip[1:]) / 2 / n_steps
+        np.testing.assert_allclose(
+            linear[n_steps // 2 :: n_steps], middle, rtol=1e-5, atol=1e-6
+        )
+
+    time_stamps = linear_metadata["time_stamps"]
+    n_before = metadata["time_stamps"].size - precip.shape[0]
+    assert time_stamps.size == linear.shape[0] + n_before
+    np.testing.assert_array_equal(
+        time_stamps[n_before::n_steps], metadata["time_stamps"][n_before:]
+    )
+
+
+@pytest.mark.parametrize("method", ["split", "linear"])
+def test_target_timestep_lazy_members_and_out(synthetic_file_factory, method):
+    filename = synthetic_file_factory("knmi", n_times=4, n_members=3)
+    kwargs = dict(target_timestep=20, time_interpolation=method)
+    expected, _, metadata = import_knmi_nwp(filename, **kwargs)
+    precip, _, _ = import_knmi_nwp(filename)
+    assert expected.shape[0] == 3
+    for member in range(3):
+        member_precip, _ = interpolate_time(
+            precip[member],
+            dict(accutime=60, time_stamps=None),
+            20,
+            method,
+        )
+        np.testing.assert_array_equal(expected[member], member_precip)
+
+    lazy, _, lazy_metadata = import_knmi_nwp(filename, lazy=True, **kwargs)
+    assert isinstance(lazy, dask_array.Array)
+    np.testing.assert_allclose(lazy.compute(), expected, rtol=1e-6)
+    np.testing.assert_array_equal(lazy_metadata["time_stamps"], metadata["time_stamps"])
+
+    out = np.empty_like(expected)
+    result, _, _ = import_knmi_nwp(filename, out=out, **kwargs)
+    assert result is out
+    np.testing.assert_array_equal(out, expected)
+
+
+@pytest.mark.parametrize("method", ["split", "linear"])
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_target_timestep_iterators(synthetic_files, layout, method):
+    kwargs = dict(target_timestep=5, time_interpolation=method)
+    expected, _, metadata = IMPORTERS[layout](synthetic_files[layout], **kwargs)
+
+    steps = list(ITERATORS[layout](synthetic_files[layout], **kwargs))
+    assert len(steps) == expected.shape[0]
+    n_before = metadata["time_stamps"].size - expected.shape[0]
+    for i, (time_stamp, field, step_metadata) in enumerate(steps):
+        assert time_stamp == metadata["time_stamps"][n_before + i]
+        np.testing.assert_allclose(field, expected[i], rtol=1e-5, atol=1e-7)
+    np.testing.assert_array_equal(step_metadata["time_stamps"], metadata["time_stamps"])
+    assert step_metadata["accutime"] == 5
+
+
+def test_target_timestep_not_dividing(synthetic_files):
+    with pytest.raises(ValueError, match="must divide"):
+        import_rmi_nwp(synthetic_files["rmi"], target_timestep=3)
+    with pytest.raises(ValueError, match="method"):
+        import_rmi_nwp(
+            synthetic_files["rmi"], target_timestep=5, time_interpolation="cubic"
+        )
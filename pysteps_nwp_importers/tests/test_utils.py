@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.utils import (
+    IMPORT_KWARGS_DOC,
+    Timings,
+    _get_min_and_above_min,
+    disaggregate,
+    get_zerovalue_threshold,
+)
+
+dask_array = pytest.importorskip("dask.array")
+
+
+def _accumulations(n_times=6, n_rows=5, n_cols=4):
+    rng = np.random.default_rng(0)
+    precip = rng.uniform(0.0, 2.0, size=(n_times, n_rows, n_cols))
+    # packing noise making some accumulations decrease slightly
+    noise = rng.uniform(-0.01, 0.01, size=precip.shape)
+    return np.cumsum(precip, axis=0) + noise
+
+
+@pytest.mark.parametrize("as_dataarray", [False, True])
+def test_disaggregate(as_dataarray):
+    accum = _accumulations()
+    expected = np.diff(accum.astype("float32"), axis=0)
+    if as_dataarray:
+        accum = xr.DataArray(accum, dims=("t", "y", "x"))
+
+    precip = disaggregate(accum)
+
+    assert precip.dtype == np.float32
+    assert precip.shape == expected.shape
+    np.testing.assert_array_equal(precip, expected)
+
+
+def test_disaggregate_clip_negative_and_out():
+    accum = _accumulations()
+    accum[3, 0, 0] = accum[2, 0, 0] - 0.005
+    out = np.full((accum.shape[0] - 1,) + accum.shape[1:], np.nan, dtype="float64")
+
+    precip = disaggregate(accum, dtype="float64", clip_negative=True, out=out)
+
+    assert precip is out
+    assert precip[2, 0, 0] == 0.0
+    np.testing.assert_array_equal(precip, np.maximum(np.diff(accum, axis=0), 0.0))
+
+
+def test_disaggregate_dask():
+    accum = _accumulations()
+    lazy_accum = xr.DataArray(accum, dims=("t", "y", "x")).chunk({"t": 1})
+
+    precip = disaggregate(lazy_accum, clip_negative=True)
+
+    assert isinstance(precip, dask_array.Array)
+    np.testing.assert_array_equal(
+        precip.compute(), disaggregate(accum, clip_negative=True)
+    )
+
+
+def _reference_zerovalue_threshold(precip):
+    valid = precip[np.isfinite(precip)]
+    if valid.size == 0:
+        return np.nan, np.nan
+    above_min = valid[valid > valid.min()]
+    threshold = above_min.min() if above_min.size > 0 else valid.min()
+    return valid.min(), threshold
+
+
+def _fields():
+    rng = np.random.default_rng(1)
+    precip = np.round(rng.gamma(0.3, 2.0, size=(4, 30, 25)), 1)
+    precip[0, :10] = np.nan
+    precip[1] = np.nan
+    precip[2] = 0.3
+    return precip
+
+
+@pytest.mark.parametrize("chunks", [None, (2, 30, 25), (1, 7, 10)])
+def test_get_zerovalue_threshold(chunks):
+    precip = _fields()
+    data = precip if chunks is None else dask_array.from_array(precip, chunks=chunks)
+
+    zerovalue, threshold = get_zerovalue_threshold(data)
+    assert (zerovalue, threshold) == _reference_zerovalue_threshold(precip)
+
+    zerovalues, thresholds = get_zerovalue_threshold(data, per_time_step=True)
+    for i in range(precip.shape[0]):
+        expected = _reference_zerovalue_threshold(precip[i])
+        np.testing.assert_array_equal((zerovalues[i], thresholds[i]), expected)
+
+
+def test_get_zerovalue_threshold_blocks_and_clipping():
+    precip = _fields()[3] - 0.5
+
+    # blocks of a few rows are merged in the same way as whole fields
+    pairs = _get_min_and_above_min(precip, block_size=60)
+    assert tuple(pairs) == _reference_zerovalue_threshold(precip)
+
+    zerovalue, threshold = get_zerovalue_threshold(precip, clip_negative=True)
+    assert (zerovalue, threshold) == _reference_zerovalue_threshold(
+        np.maximum(precip, 0.0)
+    )
+
+
+def test_timings_exclude_nested_stages():
+    timings = Timings()
+    with timings.stage("outer"):
+        with timings.stage("inner"):
+            time.sleep(0.02)
+    with timings.stage("inner"):
+        time.sleep(0.01)
+
+    assert timings["inner"] >= 0.03
+    assert timings["outer"] < 0.01
+
+
+@pytest.mark.parametrize("importer", [import_knmi_nwp, import_bom_nwp])
+def test_import_kwargs_doc(importer):
+    doc = importer.__doc__
+    assert "{import_kwargs_doc}" not in doc
+    # indented as the other parameters of the docstring
+    indent = doc[: doc.index("filename: str")].rsplit("\n", 1)[1]
+    for line in IMPORT_KWARGS_DOC.splitlines():
+        assert indent + line in doc
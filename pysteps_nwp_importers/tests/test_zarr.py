@@ -0,0 +1,162 @@
+import subprocess
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from pysteps_nwp_importers.importer_bom_nwp import import_bom_nwp
+from pysteps_nwp_importers.importer_knmi_nwp import import_knmi_nwp
+from pysteps_nwp_importers.importer_rmi_nwp import import_rmi_nwp
+from pysteps_nwp_importers.importer_zarr_nwp import (
+    import_zarr_nwp,
+    import_zarr_nwp_metadata,
+)
+from pysteps_nwp_importers.zarr_converter import convert_to_zarr, main
+
+pytest.importorskip("netCDF4")
+pytest.importorskip("zarr")
+
+IMPORTERS = dict(knmi=import_knmi_nwp, bom=import_bom_nwp, rmi=import_rmi_nwp)
+
+
+def _assert_same_metadata(metadata, expected_metadata):
+    assert set(metadata.keys()) == set(expected_metadata.keys())
+    for key, expected_value in expected_metadata.items():
+        if isinstance(expected_value, str) or expected_value is None:
+            assert metadata[key] == expected_value
+        elif key == "time_stamps":
+            np.testing.assert_array_equal(metadata[key], expected_value)
+        else:
+            np.testing.assert_allclose(metadata[key], expected_value, rtol=1e-12)
+
+
+@pytest.mark.parametrize("layout", IMPORTERS.keys())
+def test_zarr_round_trip(synthetic_files, tmp_path, layout):
+    importer = IMPORTERS[layout]
+    store = str(tmp_path / "store.zarr")
+    precip, _, metadata = importer(synthetic_files[layout])
+
+    convert_to_zarr(importer, [synthetic_files[layout]], store)
+
+    with xr.open_zarr(store) as ds:
+        assert ds.precipitation.encoding["chunks"] == (1, 1) + precip.shape[1:]
+        assert ds.attrs["yorigin"] == metadata["yorigin"]
+    zarr_precip, quality, zarr_metadata = import_zarr_nwp(store)
+    assert quality is None
+    assert zarr_precip.dtype == np.float32
+    np.testing.assert_array_equal(zarr_precip, precip)
+    _assert_same_metadata(zarr_metadata, metadata)
+
+    time_stamps = metadata["time_stamps"]
+    window_kwargs = dict(
+        start_time=time_stamps[2],
+        end_time=time_stamps[4],
+        bbox=(
+            metadata["x1"] + 1.9 * metadata["xpixelsize"],
+            metadata["y1"] + 2.9 * metadata["ypixelsize"],
+            metadata["x1"] + 7.1 * metadata["xpixelsize"],
+            metadata["y1"] + 9.1 * metadata["ypixelsize"],
+        ),
+    )
+    precip, _, metadata = importer(synthetic_files[layout], **window_kwargs)
+    zarr_precip, _, zarr_metadata = import_zarr_nwp(store, lazy=True, **window_kwargs)
+    np.testing.assert_array_equal(zarr_precip.compute(), precip)
+    # the zerovalue and threshold of the store are those of the whole domain
+    metadata.update(zerovalue=None, threshold=None)
+    zarr_metadata.update(zerovalue=None, threshold=None)
+    _assert_same_metadata(zarr_metadata, metadata)
+
+
+def test_zarr_append_runs(synthetic_files, synthetic_file_factory, tmp_path):
+    store = str(tmp_path / "store.zarr")
+    filename = synthetic_files["rmi"]
+    with xr.open_dataset(filename) as ds:
+        other_filename = str(tmp_path / "rmi_other.nc")
+        ds.assign(precipitation=ds.precipitation * 2).to_netcdf(other_filename)
+
+    main(["rmi", store, filename])
+    main(["rmi", store, other_filename, "--append"])
+
+    first_precip, _, _ = import_zarr_nwp(store, run=0)
+    last_precip, _, _ = import_zarr_nwp(store)
+    np.testing.assert_array_equal(first_precip, import_rmi_nwp(filename)[0])
+    np.testing.assert_array_equal(last_precip, 2 * first_precip)
+    assert import_zarr_nwp_metadata(store)["threshold"] is not None
+
+    with pytest.raises(ValueError):
+        convert_to_zarr(import_rmi_nwp, [filename], store)
+    with pytest.raises(ValueError, match="grid"):
+        convert_to_zarr(
+            import_rmi_nwp,
+            [synthetic_file_factory("rmi", n_cols=30)],
+            store,
+            append=True,
+        )
+    with xr.open_zarr(store) as ds:
+        assert ds.sizes["run"] == 2
+
+
+def test_zarr_command_line(synthetic_files, tmp_path):
+    store = str(tmp_path / "store.zarr")
+    subprocess.run(
+        ["pysteps-nwp-to-zarr", "knmi", store, synthetic_files["knmi"]], check=True
+    )
+    np.testing.assert_array_equal(
+        import_zarr_nwp(store)[0], import_knmi_nwp(synthetic_files["knmi"])[0]
+    )
+
+
+def test_zarr_members(synthetic_file_factory, tmp_path):
+    store = str(tmp_path / "store.zarr")
+    filename = synthetic_file_factory("knmi", n_members=3)
+    precip, _, metadata = import_knmi_nwp(filename)
+
+    convert_to_zarr(import_knmi_nwp, [filename], store)
+    convert_to_zarr(import_knmi_nwp, [filename], store, append=True)
+
+    with xr.open_zarr(store) as ds:
+        assert ds.precipitation.dims == ("run", "member", "t", "y", "x")
+        assert ds.precipitation.encoding["chunks"] == (1, 1, 1) + precip.shape[2:]
+    zarr_precip, _, zarr_metadata = import_zarr_nwp(store)
+    np.testing.assert_array_equal(zarr_precip, precip)
+    _assert_same_metadata(zarr_metadata, metadata)
+
+    subset, _, _ = import_knmi_nwp(filename, members=[0, 2])
+    zarr_subset, _, _ = import_zarr_nwp(store, run=0, members=[0, 2], lazy=True)
+    np.testing.assert_array_equal(zarr_subset.compute(), subset)
+
+    with pytest.raises(ValueError, match="dimensions"):
+        convert_to_zarr(
+            import_knmi_nwp, [synthetic_file_factory("knmi")], store, append=True
+        )
+    with pytest.raises(ValueError, match="members"):
+        convert_to_zarr(
+            import_knmi_nwp,
+            [synthetic_file_factory("knmi", n_members=2)],
+            store,
+            append=True,
+        )
+    deterministic_store = convert_to_zarr(
+        import_knmi_nwp,
+        [synthetic_file_factory("knmi")],
+        str(tmp_path / "deterministic.zarr"),
+    )
+    with pytest.raises(ValueError, match="no members"):
+        import_zarr_nwp(deterministic_store, members=0)
+
+
+def test_zarr_packed(synthetic_file_factory, tmp_path):
+    store = str(tmp_path / "store.zarr")
+    filename = synthetic_file_factory("knmi", packed=True)
+
+    with pytest.raises(ValueError, match="packed"):
+        convert_to_zarr(import_knmi_nwp, [filename], store, packed=True)
+    assert not (tmp_path / "store.zarr").exists()
+
+    # the packed values of the file are stored unpacked
+    precip, _, metadata = import_knmi_nwp(filename)
+    convert_to_zarr(import_knmi_nwp, [filename], store)
+    zarr_precip, _, zarr_metadata = import_zarr_nwp(store)
+    assert zarr_precip.dtype == np.float32
+    np.testing.assert_array_equal(zarr_precip, precip)
+    _assert_same_metadata(zarr_metadata, metadata)
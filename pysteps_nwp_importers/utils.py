@@ -0,0 +1,1141 @@
+"""
+pysteps_nwp_importers.utils
+====================
+
+Helper functions shared by the NWP importers.
+
+.. autosummary::
+    :toctree: ../generated/
+
+    Sanitizer
+    Timings
+    compose
+    disaggregate
+    disaggregate_packed
+    get_packing
+    get_sanitizer
+    get_zerovalue_threshold
+    iter_fields
+    load_array
+    prefetch
+    select_bbox
+    select_members
+    select_time_window
+    unpack
+"""
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from pysteps_nwp_importers.conversion import convert_array, get_converter
+from pysteps_nwp_importers.dataset_pool import get_pool
+
+# names of the ensemble member dimension in the NWP files
+MEMBER_DIMS = ("member", "ensemble_member", "realization", "number")
+
+# modes of the Sanitizer
+SANITIZE_MODES = ("negative", "all")
+
+
+class Timings(dict):
+    """Durations in seconds of the stages of an import, by stage name.
+
+    The stages are timed with :py:meth:`stage`. The duration of a stage
+    excludes the duration of the stages timed within it, so that the
+    durations add up to the total duration of the import.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._nested = []
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager adding the duration of its block to a stage."""
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self[name] = self.get(name, 0.0) + duration - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += duration
+
+    def report(self, logger, filename, precipitation, callback=None):
+        """Log the timings of the import of a file at the debug level and pass
+        them to a callback, with the size in bytes of the file and of the
+        imported precipitation."""
+        self["file_size"] = os.path.getsize(filename)
+        self["nbytes"] = precipitation.nbytes
+        logger.debug("Imported %s: %s", filename, self)
+        if callback is not None:
+            callback(dict(self))
+
+
+class Sanitizer:
+    """Function correcting precipitation fields in place, counting the
+    corrected values.
+
+    Parameters
+    ----------
+    mode: {"negative", "all"}
+        With "negative", the negative values are set to zero. With "all", the
+        NaNs, including the masked fill values of the file, are also set to
+        the zerovalue.
+    zerovalue: float, optional
+        Value replacing the NaNs. Defaults to 0.
+
+    Attributes
+    ----------
+    count: int
+        Number of values corrected so far.
+    """
+
+    def __init__(self, mode, zerovalue=None):
+        if mode not in SANITIZE_MODES:
+            raise ValueError(
+                f"unknown sanitize mode {mode}, expected one of {SANITIZE_MODES}"
+            )
+        self.mode = mode
+        self.zerovalue = 0.0 if zerovalue is None else max(float(zerovalue), 0.0)
+        self.count = 0
+
+    def __call__(self, field):
+        """Correct a field in place and return it."""
+        invalid = field < 0.0
+        self.count += int(np.count_nonzero(invalid))
+        np.copyto(field, 0.0, where=invalid, casting="unsafe")
+        if self.mode == "all":
+            np.isnan(field, out=invalid)
+            self.count += int(np.count_nonzero(invalid))
+            np.copyto(field, self.zerovalue, where=invalid, casting="unsafe")
+        return field
+
+
+def get_sanitizer(metadata, **kwargs):
+    """Return the :py:class:`Sanitizer` of the sanitize keyword of the
+    importers, replacing the NaNs by the zerovalue of the metadata, or None."""
+    mode = kwargs.get("sanitize")
+    if mode is None:
+        return None
+    return Sanitizer(mode, metadata.get("zerovalue"))
+
+
+def compose(*functions):
+    """Compose functions converting a field in place, ignoring the None ones.
+
+    Returns
+    -------
+    function or None
+        Function applying the functions in order, or None if all are None.
+    """
+    functions = [function for function in functions if function is not None]
+    if not functions:
+        return None
+    if len(functions) == 1:
+        return functions[0]
+
+    def _composed(field):
+        for function in functions:
+            field = function(field)
+        return field
+
+    return _composed
+
+
+def select_bbox(ds, bbox):
+    """Select the grid points of a dataset that fall within a bounding box.
+
+    The selection is done by position on the x and y coordinates, so that only
+    the sub-domain is read from the file. The orientation of the y-axis is
+    preserved, i.e. the yorigin of the data is not changed.
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+        Dataset to subset, with monotonic x and y coordinates.
+    bbox: tuple or None
+        Bounding box (x1, y1, x2, y2) in the units of the x and y coordinates
+        of the dataset. If None, the dataset is returned as is.
+
+    Returns
+    -------
+    ds: xarray.Dataset
+        The subset of the dataset.
+    """
+    if bbox is None:
+        return ds
+
+    x1, y1, x2, y2 = bbox
+    x = ds.x.values
+    y = ds.y.values
+    x_idx = np.flatnonzero((x >= min(x1, x2)) & (x <= max(x1, x2)))
+    y_idx = np.flatnonzero((y >= min(y1, y2)) & (y <= max(y1, y2)))
+
+    if x_idx.size < 2 or y_idx.size < 2:
+        raise ValueError(
+            f"the bounding box {bbox} must contain at least two grid points "
+            f"in each direction: the grid covers x={x.min()}..{x.max()} and "
+            f"y={y.min()}..{y.max()}"
+        )
+
+    return ds.isel(
+        x=slice(x_idx[0], x_idx[-1] + 1),
+        y=slice(y_idx[0], y_idx[-1] + 1),
+    )
+
+
+def select_members(ds, varname, members=None, varname_member=None):
+    """Select the ensemble members of a dataset.
+
+    The selection is done by position along the member dimension, so that
+    only the selected members are read from the file. The data variable is
+    transposed to have the member as first dimension.
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+        Dataset to subset.
+    varname: str
+        Name of the data variable.
+    members: int or list of int, optional
+        Indices of the members to select. If None, all the members are kept.
+    varname_member: str, optional
+        Name of the member dimension. If None, the first of the dimensions
+        in MEMBER_DIMS found in the data variable is used.
+
+    Returns
+    -------
+    ds: xarray.Dataset
+        The subset of the dataset.
+    varname_member: str or None
+        Name of the member dimension, or None if the data variable has no
+        member dimension.
+    """
+    dims = ds[varname].dims
+    if varname_member is None:
+        varname_member = next((dim for dim in MEMBER_DIMS if dim in dims), None)
+    elif varname_member not in dims:
+        raise ValueError(f"{varname} has no dimension {varname_member}: {dims}")
+
+    if varname_member is None:
+        if members is not None:
+            raise ValueError(f"members are selected but {varname} has no members")
+        return ds, None
+
+    if members is not None:
+        ds = ds.isel({varname_member: np.atleast_1d(members)})
+    da = ds[varname].transpose(varname_member, ...)
+    return ds.assign({varname: da}), varname_member
+
+
+def select_time_window(ds, varname_time, start_time=None, end_time=None, n_before=0):
+    """Select the time steps of a dataset within a time window.
+
+    The selection is done by position on the (already loaded) time coordinate,
+    so that no data is read from the file for the discarded time steps.
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+        Dataset to subset.
+    varname_time: str
+        Name of the time dimension.
+    start_time: datetime-like or None
+        First time step of the window (inclusive). If None, the window starts
+        at the first time step of the dataset.
+    end_time: datetime-like or None
+        Last time step of the window (inclusive). If None, the window ends at
+        the last time step of the dataset.
+    n_before: int
+        Number of additional time steps to keep before the start of the window,
+        e.g. 1 to disaggregate accumulated values.
+
+    Returns
+    -------
+    ds: xarray.Dataset
+        The subset of the dataset.
+    """
+    if start_time is None and end_time is None:
+        return ds
+
+    times = ds[varname_time].values
+    start = 0
+    if start_time is not None:
+        start = np.searchsorted(times, np.datetime64(start_time), side="left")
+    end = times.size
+    if end_time is not None:
+        end = np.searchsorted(times, np.datetime64(end_time), side="right")
+
+    if start >= end:
+        raise ValueError(
+            f"no time steps found between {start_time} and {end_time}: "
+            f"the file covers {times[0]} to {times[-1]}"
+        )
+    start = max(start - n_before, 0)
+
+    return ds.isel({varname_time: slice(start, end)})
+
+
+def load_array(da, dtype="float32", out=None, convert=None):
+    """Read a data array into an array of the given data type.
+
+    The data are read and decoded one field at a time into a preallocated
+    array, so that the peak memory stays close to the size of the output
+    instead of holding the default float64 decoding of the whole array.
+    If the data array is backed by dask, the cast is done lazily.
+
+    Parameters
+    ----------
+    da: xarray.DataArray
+        Data array with the rows and columns as last two dimensions, e.g.
+        [time, rows, cols] or [member, time, rows, cols].
+    dtype: str
+        Data type of the output array.
+    out: numpy.ndarray, optional
+        Preallocated output array with the shape of the data array. If given,
+        its data type is used instead of dtype.
+    convert: function, optional
+        Function converting a field in place, applied to each field once it is
+        read, see :py:func:`pysteps_nwp_importers.conversion.get_converter`.
+
+    Returns
+    -------
+    out: array-like
+        Numpy array, or dask array if the data array is backed by dask.
+    """
+    if da.chunks is not None:
+        data = da.data.astype(dtype)
+        return data if convert is None else convert_array(data, convert)
+
+    out = _get_out_array(out, da.shape, dtype)
+    for index in np.ndindex(da.shape[:-2]):
+        out[index] = da[index].values
+        if convert is not None:
+            convert(out[index])
+    return out
+
+
+def iter_fields(
+    da,
+    dtype="float32",
+    accumulated=False,
+    clip_negative=False,
+    time_axis=0,
+    convert=None,
+):
+    """Iterate over the time steps of a data array, reading one field at a time.
+
+    Parameters
+    ----------
+    da: xarray.DataArray
+        Data array with a time dimension.
+    dtype: str
+        Data type of the fields.
+    accumulated: bool
+        If True, the values are accumulated and are disaggregated by time
+        step, keeping only the previous accumulation in memory. The first time
+        step is not yielded since it has no preceding accumulation.
+    clip_negative: bool
+        If True, the negative values obtained when disaggregating accumulated
+        values are set to zero.
+    time_axis: int
+        Axis of the time dimension, e.g. 1 for [member, time, rows, cols].
+    convert: function, optional
+        Function converting a field in place, applied to each field before it
+        is yielded.
+
+    Yields
+    ------
+    time_stamp: numpy.datetime64
+        Time stamp of the field.
+    field: numpy.ndarray
+        Field of the given data type, with the dimensions of the data array
+        other than time.
+    """
+    time_dim = da.dims[time_axis]
+    time_stamps = da[time_dim].values
+
+    previous = None
+    for i in range(da.shape[time_axis]):
+        field = np.asarray(da.isel({time_dim: i}), dtype=dtype)
+        if not accumulated:
+            if convert is not None:
+                convert(field)
+            yield time_stamps[i], field
+            continue
+
+        if previous is not None:
+            precip = np.subtract(field, previous)
+            if clip_negative:
+                np.maximum(precip, 0.0, out=precip)
+            if convert is not None:
+                convert(precip)
+            yield time_stamps[i], precip
+        previous = field
+
+
+def prefetch(iterable, n_prefetch=1):
+    """Iterate over an iterable while a background thread reads ahead.
+
+    The next items are produced in a background thread while the current one
+    is used, so that reading and decompressing the next fields from the file
+    overlaps with the processing of the current field. At most n_prefetch
+    items are kept in memory ahead of the consumer.
+
+    The background thread is stopped, and the iterable closed, as soon as the
+    returned generator is closed, e.g. when the consumer stops early.
+
+    Parameters
+    ----------
+    iterable: iterable
+        Items to iterate over. Generators are closed from the background
+        thread when the iteration stops.
+    n_prefetch: int
+        Maximum number of items read ahead. If 0 or None, the iterable is
+        iterated over in the calling thread.
+
+    Yields
+    ------
+    item
+        The items of the iterable, in the same order.
+    """
+    if not n_prefetch:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=n_prefetch)
+    stop = threading.Event()
+
+    def _put(kind, value):
+        # give up as soon as the consumer is gone
+        while not stop.is_set():
+            try:
+                items.put((kind, value), timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not _put("item", item):
+                    return
+            _put("done", None)
+        except BaseException as exc:
+            _put("error", exc)
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    thread = threading.Thread(target=_produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+        thread.join()
+
+
+def disaggregate(
+    accum, dtype="float32", clip_negative=False, out=None, time_axis=0, convert=None
+):
+    """Disaggregate accumulated values by time step.
+
+    Consecutive accumulations are differenced one time step at a time into a
+    single output array of length T-1, keeping only the previous accumulation
+    in memory. No NaN padded copy of the data is created.
+
+    Parameters
+    ----------
+    accum: xarray.DataArray or array-like
+        Accumulated values.
+    dtype: str
+        Data type of the output array.
+    clip_negative: bool
+        If True, the small negative values resulting from the packing or the
+        rounding of the accumulations are set to zero in the same pass.
+    out: numpy.ndarray, optional
+        Preallocated output array of shape [T-1, ...], or [M, T-1, ...] if
+        time_axis is 1. If given, its data type is used instead of dtype.
+    time_axis: int
+        Axis of the time dimension, e.g. 1 for [member, time, rows, cols].
+    convert: function, optional
+        Function converting a field in place, applied to each field once it is
+        disaggregated, see
+        :py:func:`pysteps_nwp_importers.conversion.get_converter`.
+
+    Returns
+    -------
+    precip: array-like
+        Values accumulated over each time step. The first time step is
+        dropped since it has no preceding accumulation. If the input is backed
+        by dask, a dask array is returned.
+    """
+    if getattr(accum, "chunks", None) is not None:
+        data = accum.data if hasattr(accum, "dims") else accum
+        data = data.astype(dtype)
+        leading = (slice(None),) * time_axis
+        precip = data[leading + (slice(1, None),)] - data[leading + (slice(-1),)]
+        if clip_negative:
+            precip = np.maximum(precip, 0.0)
+        return precip if convert is None else convert_array(precip, convert)
+
+    shape = tuple(accum.shape)
+    n_times = shape[time_axis] - 1
+    out = _get_out_array(
+        out, shape[:time_axis] + (n_times,) + shape[time_axis + 1 :], dtype
+    )
+
+    # the time series of each member are disaggregated one after the other
+    for leading in np.ndindex(shape[:time_axis]):
+        previous = np.asarray(accum[leading + (0,)], dtype=out.dtype)
+        for i in range(n_times):
+            current = np.asarray(accum[leading + (i + 1,)], dtype=out.dtype)
+            field = out[leading + (i,)]
+            np.subtract(current, previous, out=field)
+            if clip_negative:
+                np.maximum(field, 0.0, out=field)
+            if convert is not None:
+                convert(field)
+            previous = current
+
+    return out
+
+
+def get_packing(da):
+    """Return the packing of a data array opened without decoding it, i.e.
+    with ``mask_and_scale=False``.
+
+    Parameters
+    ----------
+    da: xarray.DataArray
+        Data array with the raw values of the file.
+
+    Returns
+    -------
+    packing: dict
+        The scale_factor and add_offset of the values, 1 and 0 if the
+        values are not packed, and their fill_value, or None if they have
+        none.
+    """
+    fill_value = da.attrs.get("_FillValue", da.attrs.get("missing_value"))
+    if fill_value is not None:
+        fill_value = np.asarray(fill_value, dtype=da.dtype).item()
+    return dict(
+        scale_factor=float(da.attrs.get("scale_factor", 1.0)),
+        add_offset=float(da.attrs.get("add_offset", 0.0)),
+        fill_value=fill_value,
+    )
+
+
+def unpack(packed, packing, dtype="float32", out=None):
+    """Unpack packed values, one field at a time.
+
+    The values are scaled directly in the output data type, without the
+    float64 array of the default decoding of xarray, and the fill values are
+    set to NaN.
+
+    Parameters
+    ----------
+    packed: array-like
+        Packed values with the rows and columns as last two dimensions, e.g.
+        the precipitation returned by the importers with ``packed=True``.
+        Dask arrays are unpacked lazily, block by block.
+    packing: dict
+        The scale_factor, add_offset and fill_value of the values, e.g. the
+        metadata returned with them, see :py:func:`get_packing`.
+    dtype: str
+        Floating point data type of the output array.
+    out: numpy.ndarray, optional
+        Preallocated output array with the shape of the packed values. If
+        given, its data type is used instead of dtype.
+
+    Returns
+    -------
+    out: array-like
+        Numpy array, or dask array if the packed values are a dask array.
+    """
+    if getattr(packed, "chunks", None) is not None:
+        return packed.map_blocks(unpack, packing, dtype, dtype=dtype)
+
+    out = _get_out_array(out, packed.shape, dtype)
+    scale_factor = out.dtype.type(packing["scale_factor"])
+    add_offset = out.dtype.type(packing["add_offset"])
+    fill_value = packing.get("fill_value")
+    for index in np.ndindex(packed.shape[:-2]):
+        field = np.asarray(packed[index])
+        np.multiply(field, scale_factor, out=out[index], casting="unsafe")
+        if add_offset != 0:
+            out[index] += add_offset
+        if fill_value is not None:
+            np.copyto(out[index], np.nan, where=field == fill_value)
+    return out
+
+
+def disaggregate_packed(
+    accum, fill_value=None, clip_negative=False, out=None, time_axis=0
+):
+    """Disaggregate packed accumulated values by time step, without unpacking
+    them.
+
+    The differences of the packed values are the packed differences of the
+    accumulations, with the scale_factor of the accumulations and an
+    add_offset of zero. They are exact and keep the data type of the packed
+    values.
+
+    Parameters
+    ----------
+    accum: xarray.DataArray or array-like
+        Packed accumulated values.
+    fill_value: int, optional
+        Fill value of the packed values. The differences involving a fill
+        value are set to the fill value.
+    clip_negative: bool
+        If True, the negative differences are set to zero.
+    out: numpy.ndarray, optional
+        Preallocated output array of shape [T-1, ...], or [M, T-1, ...] if
+        time_axis is 1, with the data type of the packed values.
+    time_axis: int
+        Axis of the time dimension, e.g. 1 for [member, time, rows, cols].
+
+    Returns
+    -------
+    precip: array-like
+        Packed values accumulated over each time step. The first time step is
+        dropped since it has no preceding accumulation. If the input is backed
+        by dask, a dask array is returned.
+
+    Raises
+    ------
+    ValueError
+        If a difference does not fit in the data type of the packed values.
+    """
+    if getattr(accum, "chunks", None) is not None:
+        import dask.array as da
+
+        data = accum.data if hasattr(accum, "dims") else accum
+        leading = (slice(None),) * time_axis
+        return da.map_blocks(
+            _subtract_packed,
+            data[leading + (slice(1, None),)],
+            data[leading + (slice(-1),)],
+            fill_value,
+            clip_negative,
+            dtype=data.dtype,
+        )
+
+    shape = tuple(accum.shape)
+    n_times = shape[time_axis] - 1
+    out = _get_out_array(
+        out, shape[:time_axis] + (n_times,) + shape[time_axis + 1 :], accum.dtype
+    )
+
+    for leading in np.ndindex(shape[:time_axis]):
+        previous = np.asarray(accum[leading + (0,)])
+        for i in range(n_times):
+            current = np.asarray(accum[leading + (i + 1,)])
+            _subtract_packed(
+                current, previous, fill_value, clip_negative, out=out[leading + (i,)]
+            )
+            previous = current
+
+    return out
+
+
+def _subtract_packed(current, previous, fill_value, clip_negative, out=None):
+    """Difference of packed values, checked against the range of their data
+    type."""
+    dtype = current.dtype
+    if np.issubdtype(dtype, np.integer):
+        # the difference of two packed values may not fit in their data type
+        difference = np.subtract(current, previous, dtype="int64")
+    else:
+        difference = np.subtract(current, previous)
+    if clip_negative:
+        np.maximum(difference, 0, out=difference)
+    if fill_value is not None:
+        filled = (current == fill_value) | (previous == fill_value)
+        np.copyto(difference, fill_value, where=filled)
+    if np.issubdtype(dtype, np.integer) and difference.size > 0:
+        info = np.iinfo(dtype)
+        if difference.min() < info.min or difference.max() > info.max:
+            raise ValueError(
+                f"the disaggregated values do not fit in the packed data type "
+                f"{dtype}, import them without packed=True"
+            )
+    if out is None:
+        return difference.astype(dtype, copy=False)
+    out[...] = difference
+    return out
+
+
+def _check_packed_kwargs(**kwargs):
+    """Raise a ValueError if the keywords of an import with packed=True need
+    the unpacked values."""
+    for name in ("sanitize", "to_unit", "transform", "target_grid", "target_timestep"):
+        if kwargs.get(name) is not None:
+            raise ValueError(f"{name} cannot be used with packed=True")
+
+
+def _check_iterator_kwargs(**kwargs):
+    """Raise a ValueError if the keywords of an iterator are only supported by
+    the import of the whole file."""
+    for name in ("lazy", "chunks", "out", "cache", "target_grid", "packed"):
+        value = kwargs.get(name)
+        if value is not None and value is not False:
+            raise ValueError(f"{name} is not supported by the iterators")
+
+
+def _is_lazy(**kwargs):
+    return kwargs.get("lazy", False) or kwargs.get("chunks", None) is not None
+
+
+# documentation of the keywords of the NetCDF importers handled by _import_nwp,
+# inserted in the docstrings of the importers in place of {import_kwargs_doc}
+IMPORT_KWARGS_DOC = """\
+lazy: bool, optional
+    If True, the precipitation is returned as a dask array chunked along
+    the time dimension, so that a lead time is only read from the file
+    when it is computed. Defaults to False.
+chunks: dict, optional
+    Chunk sizes used to open the file, as a mapping from dimension names
+    to chunk sizes. Setting it implies ``lazy=True``. Defaults to one
+    chunk per time step.
+bbox: tuple, optional
+    Bounding box (x1, y1, x2, y2) of the sub-domain to import, in the
+    same coordinates and units as the x1, y1, x2 and y2 metadata. Only
+    the grid points within the box are read from the file.
+members: int or list of int, optional
+    Indices of the ensemble members to import, if the file has a member
+    dimension. Only the selected members are read from the file, and the
+    zerovalue and threshold are computed from them. Defaults to all the
+    members.
+varname_member: str, optional
+    Name of the member dimension. Defaults to the first of "member",
+    "ensemble_member", "realization" and "number" found in the file.
+target_grid: dict, optional
+    Metadata of a grid in the pysteps format, e.g. the metadata of a
+    radar composite, onto which the precipitation is interpolated
+    bilinearly. The returned metadata then describe the target grid. See
+    :py:mod:`pysteps_nwp_importers.regrid`.
+weights_dir: str, optional
+    Directory in which the interpolation weights onto the target grid are
+    cached. Defaults to :py:data:`pysteps_nwp_importers.regrid.WEIGHTS_DIR`.
+target_timestep: int, optional
+    Time step in minutes, dividing the time step of the file, to which the
+    precipitation is interpolated. The time_stamps, accutime, zerovalue
+    and threshold metadata are updated accordingly. See
+    :py:mod:`pysteps_nwp_importers.temporal`.
+time_interpolation: {"split", "linear"}, optional
+    Method of the interpolation to target_timestep: "split" divides each
+    accumulation evenly between the finer time steps, conserving the
+    total precipitation, and "linear" interpolates the rates linearly
+    between the time stamps. Defaults to "split".
+sanitize: {"negative", "all"}, optional
+    Correction of the decoded fields, done in place one field at a time.
+    With "negative", the negative values are set to zero. With "all", the
+    NaNs, including the fill values of the file, are also set to the
+    zerovalue. The number of corrected values is returned in the
+    n_sanitized metadata, or None if lazy is True. Defaults to None, i.e.
+    no correction.
+to_unit: {"mm", "mm/h"}, optional
+    Unit of the returned precipitation. The fields are converted in place
+    as they are decoded. Defaults to "mm", the precipitation accumulated
+    over the time step.
+transform: {"dB", "BoxCox"}, optional
+    Transformation applied in place to the fields as they are decoded,
+    after the unit conversion. The unit, transform, threshold and
+    zerovalue metadata are set to their values in the transformed space.
+    See :py:mod:`pysteps_nwp_importers.conversion`. Defaults to None.
+boxcox_lambda: float, optional
+    Parameter of the Box-Cox transformation. Defaults to 0, i.e. a log
+    transformation.
+packed: bool, optional
+    If True, the precipitation is returned as the packed values of the
+    file, e.g. 16-bit integers, instead of being unpacked to dtype. Their
+    scale_factor, add_offset and fill_value are returned in the metadata,
+    and :py:func:`pysteps_nwp_importers.utils.unpack` unpacks them, e.g.
+    field by field into a preallocated array. Accumulations are
+    disaggregated without unpacking them, with an add_offset of 0. The
+    zerovalue and threshold are in the units of the unpacked values. It
+    cannot be combined with sanitize, to_unit, transform, target_grid and
+    target_timestep, and is undone by pysteps.io.get_method, which casts
+    the precipitation to dtype. Defaults to False.
+dtype: str, optional
+    Data type of the returned precipitation, used when decoding and
+    disaggregating the data. Defaults to "float32".
+out: numpy.ndarray, optional
+    Preallocated array to which the precipitation is written, with the
+    shape of the returned precipitation. If given, its data type is used
+    instead of dtype. Not used if lazy is True.
+pool: DatasetPool, optional
+    Pool of open datasets used to open the file. Defaults to the pool
+    shared by the importers, see :py:mod:`pysteps_nwp_importers.dataset_pool`.
+cache: DecodedCache, optional
+    On-disk cache of the decoded precipitation, see
+    :py:mod:`pysteps_nwp_importers.cache`. If given, the precipitation is
+    returned as a read-only memory map of the cached array. Not used if
+    lazy is True.
+timings_callback: function, optional
+    Function called at the end of the import with a dictionary of the
+    duration in seconds of the stages of the import ("open", "header",
+    "threshold", "decode", "disaggregate", "regrid", "interpolate" and
+    "convert"), the size in bytes of the file ("file_size") and of the
+    precipitation ("nbytes"). The stages are also logged at the debug
+    level. If the precipitation is loaded from the cache, the only stage
+    is "cache_hit".
+start_time: datetime-like, optional
+    First lead time to import (inclusive). Defaults to the first time step
+    in the file.
+end_time: datetime-like, optional
+    Last lead time to import (inclusive). Defaults to the last time step
+    in the file."""
+
+
+def _add_import_kwargs_doc(function):
+    """Replace {import_kwargs_doc} in the docstring of an importer by
+    IMPORT_KWARGS_DOC, indented as the placeholder."""
+    if function.__doc__ is not None:
+        lines = function.__doc__.splitlines()
+        for i, line in enumerate(lines):
+            if line.strip() == "{import_kwargs_doc}":
+                indent = line[: len(line) - len(line.lstrip())]
+                lines[i : i + 1] = [
+                    indent + doc_line if doc_line else doc_line
+                    for doc_line in IMPORT_KWARGS_DOC.splitlines()
+                ]
+        function.__doc__ = "\n".join(lines)
+    return function
+
+
+def _import_nwp(
+    importer,
+    filename,
+    kwargs,
+    open_dataset,
+    import_xr,
+    varname,
+    logger,
+    accumulated_varname=None,
+):
+    """Import the precipitation of a NetCDF file with the keywords of
+    IMPORT_KWARGS_DOC, the pipeline shared by the NetCDF importers.
+
+    The data are decoded on the grid and time steps of the file, then
+    regridded and interpolated in time, the last stage filling out. They are
+    converted once on their final grid and time steps, as they are decoded if
+    possible.
+
+    Parameters
+    ----------
+    importer: function
+        The importer, called by the cache when the file is not cached.
+    filename: str
+        Name of the file to import.
+    kwargs: dict
+        Keywords passed to the importer.
+    open_dataset: function
+        Function of the importer opening the file, called with the filename
+        and kwargs.
+    import_xr: function
+        Function of the importer selecting the data to read in the opened
+        dataset and reading their metadata, called with the dataset, the
+        timings of the import and kwargs.
+    varname: str
+        Name of the precipitation variable used if kwargs has no varname.
+    logger: logging.Logger
+        Logger of the importer, to which the timings are logged.
+    accumulated_varname: str, optional
+        Name of the precipitation variable holding accumulations, which are
+        disaggregated by time step.
+
+    Returns
+    -------
+    precipitation: array-like
+        Precipitation, as returned by the importer.
+    quality: None
+        No quality information is available.
+    metadata: dict
+        Metadata, as returned by the importer.
+    """
+    # imported here, as they import this module
+    from pysteps_nwp_importers.regrid import regrid
+    from pysteps_nwp_importers.temporal import interpolate_time
+
+    kwargs = dict(kwargs)
+    cache = kwargs.pop("cache", None)
+    if cache is not None:
+        return cache.load(importer, filename, **kwargs)
+
+    packed = kwargs.get("packed", False)
+    if packed:
+        _check_packed_kwargs(**kwargs)
+
+    target_grid = kwargs.get("target_grid")
+    target_timestep = kwargs.get("target_timestep")
+    out = kwargs.get("out")
+    convert_on_read = target_grid is None and target_timestep is None
+    decode_out = out if convert_on_read else None
+
+    timings = Timings()
+    with timings.stage("open"):
+        ds_file = open_dataset(filename, **kwargs)
+    try:
+        with timings.stage("header"):
+            ds, metadata = import_xr(ds_file, timings=timings, **kwargs)
+
+        sanitizer = get_sanitizer(metadata, **kwargs)
+        convert = None
+        if convert_on_read:
+            convert, metadata = get_converter(metadata, **kwargs)
+        convert = compose(sanitizer, convert)
+
+        varname = kwargs.get("varname", varname)
+        dtype = kwargs.get("dtype", "float32")
+        if packed:
+            metadata.update(get_packing(ds[varname]))
+            dtype = ds[varname].dtype
+
+        if accumulated_varname is not None and varname == accumulated_varname:
+            logger.debug("Rainfall values are accumulated. Disaggregating by time step")
+            with timings.stage("disaggregate"):
+                if packed:
+                    precipitation = disaggregate_packed(
+                        ds[varname],
+                        metadata["fill_value"],
+                        clip_negative=kwargs.get("clip_negative", False),
+                        out=decode_out,
+                        time_axis=ds[varname].ndim - 3,
+                    )
+                    metadata["add_offset"] = 0.0
+                else:
+                    precipitation = disaggregate(
+                        ds[varname],
+                        dtype,
+                        clip_negative=kwargs.get("clip_negative", False),
+                        out=decode_out,
+                        time_axis=ds[varname].ndim - 3,
+                        convert=convert,
+                    )
+        else:
+            with timings.stage("decode"):
+                precipitation = load_array(
+                    ds[varname], dtype, out=decode_out, convert=convert
+                )
+    finally:
+        # the file is kept open while the lazy array is used
+        if not _is_lazy(**kwargs):
+            get_pool(kwargs.get("pool")).release(ds_file)
+
+    if target_grid is not None:
+        with timings.stage("regrid"):
+            precipitation, metadata = regrid(
+                precipitation,
+                metadata,
+                target_grid,
+                kwargs.get("weights_dir"),
+                out=out if target_timestep is None else None,
+            )
+
+    if target_timestep is not None:
+        with timings.stage("interpolate"):
+            precipitation, metadata = interpolate_time(
+                precipitation,
+                metadata,
+                target_timestep,
+                kwargs.get("time_interpolation", "split"),
+                out=out,
+                time_axis=precipitation.ndim - 3,
+            )
+
+    if not convert_on_read:
+        convert, metadata = get_converter(metadata, **kwargs)
+        if convert is not None:
+            with timings.stage("convert"):
+                precipitation = convert_array(precipitation, convert)
+
+    if sanitizer is not None:
+        # the lazy array is only corrected when it is computed
+        metadata["n_sanitized"] = None if _is_lazy(**kwargs) else sanitizer.count
+
+    quality = None
+
+    timings.report(logger, filename, precipitation, kwargs.get("timings_callback"))
+
+    return precipitation, quality, metadata
+
+
+def _iter_nwp(
+    filename, kwargs, open_dataset, import_xr, varname, accumulated_varname=None
+):
+    """Iterate over the lead times of a NetCDF file, the generator shared by
+    the iterators of the NetCDF importers.
+
+    The parameters are those of :py:func:`_import_nwp`, and the fields are
+    yielded as by the iterators.
+    """
+    # imported here, as it imports this module
+    from pysteps_nwp_importers.temporal import (
+        interpolate_time_metadata,
+        iter_interpolate_time,
+    )
+
+    _check_iterator_kwargs(**kwargs)
+
+    ds_file = open_dataset(filename, **kwargs)
+    ds, metadata = import_xr(ds_file, **kwargs)
+    varname = kwargs.get("varname", varname)
+    accumulated = accumulated_varname is not None and varname == accumulated_varname
+
+    fields = iter_fields(
+        ds[varname],
+        kwargs.get("dtype", "float32"),
+        accumulated=accumulated,
+        clip_negative=kwargs.get("clip_negative", False),
+        time_axis=ds[varname].ndim - 3,
+        convert=get_sanitizer(metadata, **kwargs),
+    )
+    fields = prefetch(fields, kwargs.get("prefetch", 0))
+    target_timestep = kwargs.get("target_timestep")
+    if target_timestep is not None:
+        method = kwargs.get("time_interpolation", "split")
+        n_fields = ds[varname].shape[-3]
+        if accumulated:
+            # the first accumulation is not yielded
+            n_fields -= 1
+        fields = iter_interpolate_time(fields, metadata, target_timestep, method)
+        metadata = interpolate_time_metadata(
+            metadata, target_timestep, method, n_fields=n_fields
+        )
+    convert, metadata = get_converter(metadata, **kwargs)
+    try:
+        for time_stamp, field in fields:
+            if convert is not None:
+                convert(field)
+            yield time_stamp, field, metadata
+    finally:
+        fields.close()
+        get_pool(kwargs.get("pool")).release(ds_file)
+
+
+def _get_out_array(out, shape, dtype):
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != tuple(shape):
+        raise ValueError(
+            f"the output array has shape {out.shape}, expected {tuple(shape)}"
+        )
+    return out
+
+
+def get_zerovalue_threshold(precip, per_time_step=False, clip_negative=False):
+    """Get the zerovalue and the rain/no rain threshold of precipitation data.
+
+    The zerovalue is the minimum of the data and the threshold is the smallest
+    value above the minimum, both ignoring NaNs. They are computed in a single
+    pass over the data, block by block, so the temporary arrays are bounded by
+    the block size instead of the size of the data.
+
+    Parameters
+    ----------
+    precip: array-like
+        Precipitation data, with the two spatial dimensions last. Dask arrays
+        are reduced chunk by chunk.
+    per_time_step: bool
+        If True, the values are returned for each field, i.e. over the spatial
+        dimensions only. Otherwise they are computed over the whole array.
+    clip_negative: bool
+        If True, the values are computed as if the negative values were set to
+        zero.
+
+    Returns
+    -------
+    zerovalue: float or array-like
+        The minimum value. If all the values are NaNs, np.nan is returned.
+    threshold: float or array-like
+        The smallest value above the minimum. If all the valid values are equal,
+        the minimum is returned. If all the values are NaNs, np.nan is returned.
+    """
+    if hasattr(precip, "map_blocks"):
+        pairs = _get_dask_min_and_above_min(precip, clip_negative)
+    else:
+        pairs = _get_min_and_above_min(np.asarray(precip), clip_negative)
+        pairs = pairs[..., np.newaxis, :]
+
+    if not per_time_step:
+        pairs = pairs.reshape(-1, 2)
+    pairs = _merge_min_and_above_min(pairs)
+
+    zerovalue = pairs[..., 0]
+    threshold = np.where(np.isnan(pairs[..., 1]), zerovalue, pairs[..., 1])
+    if not per_time_step:
+        return float(zerovalue), float(threshold)
+    return zerovalue, threshold
+
+
+def _get_min_and_above_min(precip, clip_negative=False, block_size=65536):
+    """Minimum and smallest value above the minimum of each field of a numpy
+    array, as an array of shape [..., 2]."""
+    n_rows, n_cols = precip.shape[-2:]
+    block_rows = max(1, block_size // max(n_cols, 1))
+    n_blocks = -(-n_rows // block_rows)
+
+    pairs = np.full(precip.shape[:-2] + (n_blocks, 2), np.nan)
+    for index in np.ndindex(precip.shape[:-2]):
+        for i in range(n_blocks):
+            block = precip[index][i * block_rows : (i + 1) * block_rows]
+            if clip_negative:
+                block = np.maximum(block, 0.0)
+            block_min = np.fmin.reduce(block, axis=None)
+            above_min = block[block > block_min]
+            pairs[index + (i, 0)] = block_min
+            if above_min.size > 0:
+                pairs[index + (i, 1)] = np.min(above_min)
+
+    return _merge_min_and_above_min(pairs)
+
+
+def _get_dask_min_and_above_min(precip, clip_negative=False):
+    """Same as _get_min_and_above_min for a dask array, reduced chunk by chunk.
+    An array of shape [..., n_chunks, 2] is returned."""
+
+    def _chunk_min_and_above_min(chunk):
+        pairs = _get_min_and_above_min(chunk, clip_negative)
+        return pairs[..., np.newaxis, :]
+
+    row_chunks, col_chunks = precip.chunks[-2:]
+    pairs = precip.map_blocks(
+        _chunk_min_and_above_min,
+        chunks=precip.chunks[:-2] + ((1,) * len(row_chunks), (2,) * len(col_chunks)),
+        dtype="float64",
+    ).compute()
+
+    return pairs.reshape(pairs.shape[:-2] + (-1, 2))
+
+
+def _merge_min_and_above_min(pairs):
+    """Merge the minima and smallest values above the minima of several blocks,
+    given as an array of shape [..., n_blocks, 2]."""
+    block_min = pairs[..., 0]
+    total_min = np.fmin.reduce(block_min, axis=-1)
+    # the smallest value above the total minimum in each block is its minimum,
+    # or its smallest value above the minimum if both minima are equal
+    above_min = np.where(
+        block_min > total_min[..., np.newaxis], block_min, pairs[..., 1]
+    )
+    return np.stack([total_min, np.fmin.reduce(above_min, axis=-1)], axis=-1)
@@ -0,0 +1,220 @@
+"""
+pysteps_nwp_importers.zarr_converter
+====================
+
+Conversion of NWP forecasts to a Zarr store.
+
+The runs are imported with the importers of this package and written to a
+chunked and compressed Zarr store, with one chunk per time step by default,
+so that the lead times and sub-domains of a run can be read in parallel and
+without decompressing the whole run. The runs of ensemble forecasts are
+stored with a member dimension and one chunk per member and time step. New
+runs can be appended to an existing store along its run dimension. The runs
+are read back with
+:py:func:`pysteps_nwp_importers.importer_zarr_nwp.import_zarr_nwp`.
+
+The conversion can also be run from the command line::
+
+    pysteps-nwp-to-zarr bom store.zarr run_1.nc run_2.nc
+    pysteps-nwp-to-zarr bom store.zarr run_3.nc --append
+
+.. autosummary::
+    :toctree: ../generated/
+
+    convert_to_zarr
+    main
+"""
+
+import argparse
+import inspect
+import os
+
+import numpy as np
+import xarray as xr
+
+from pysteps_nwp_importers import importer_bom_nwp
+from pysteps_nwp_importers import importer_knmi_nwp
+from pysteps_nwp_importers import importer_rmi_nwp
+from pysteps_nwp_importers.exceptions import MissingOptionalDependency
+from pysteps_nwp_importers.importer_zarr_nwp import (
+    ATTRS_KEYS,
+    RUN_KEYS,
+    ZARR_IMPORTED,
+)
+
+IMPORTERS = dict(
+    bom=importer_bom_nwp.import_bom_nwp,
+    knmi=importer_knmi_nwp.import_knmi_nwp,
+    rmi=importer_rmi_nwp.import_rmi_nwp,
+)
+
+
+def convert_to_zarr(importer, filenames, store, append=False, chunks=None, **kwargs):
+    """Import NWP forecast runs and write them to a Zarr store.
+
+    The runs are imported and written one at a time, so that only one run is
+    held in memory.
+
+    Parameters
+    ----------
+    importer: function
+        Importer of the runs, e.g.
+        :py:func:`pysteps_nwp_importers.importer_bom_nwp.import_bom_nwp`.
+    filenames: list of str
+        Names of the files of the runs.
+    store: str
+        Path of the Zarr store.
+    append: bool, optional
+        If True, the runs are appended to an existing store, which must have
+        the same grid and number of time steps. Otherwise, the store is
+        created and must not exist. Defaults to False.
+    chunks: dict, optional
+        Chunk sizes of the precipitation in the store, as a mapping from the
+        dimension names member, t, y and x to chunk sizes. Defaults to one
+        chunk per member and time step. Not used when appending to a store.
+    kwargs
+        Keywords passed to the importer, except lazy, chunks, out and packed.
+        The store keeps the unpacked precipitation, with the data type given
+        by dtype.
+
+    Returns
+    -------
+    store: str
+        Path of the Zarr store.
+    """
+    if not ZARR_IMPORTED:
+        raise MissingOptionalDependency(
+            "zarr package is required to convert NWP rainfall forecasts "
+            "to a Zarr store but it is not installed"
+        )
+
+    if kwargs.get("packed", False):
+        # the store has no packing attributes to unpack the values with
+        raise ValueError("packed=True cannot be used to convert to a Zarr store")
+
+    importer = inspect.unwrap(importer)
+    if append and not os.path.exists(store):
+        raise ValueError(f"cannot append to {store}: the store does not exist")
+    if not append and os.path.exists(store):
+        raise ValueError(f"{store} already exists, use append=True to add runs")
+
+    for filename in filenames:
+        precipitation, _, metadata = importer(filename, **kwargs)
+        ds = _to_dataset(precipitation, metadata)
+
+        if append:
+            _check_same_grid(store, ds, filename)
+            ds.to_zarr(store, append_dim="run")
+        else:
+            encoding_chunks = dict(member=1, t=1, y=ds.sizes["y"], x=ds.sizes["x"])
+            encoding_chunks.update(chunks or {})
+            dims = ds["precipitation"].dims[1:]
+            encoding = dict(
+                precipitation=dict(
+                    chunks=(1,) + tuple(encoding_chunks[dim] for dim in dims)
+                )
+            )
+            ds.to_zarr(store, mode="w-", encoding=encoding)
+            append = True
+
+    return store
+
+
+def _to_dataset(precipitation, metadata):
+    """Build the dataset of a run, with a run dimension of size 1."""
+    n_rows, n_cols = precipitation.shape[-2:]
+    x = metadata["x1"] + np.arange(n_cols) * metadata["xpixelsize"]
+    y = metadata["y1"] + np.arange(n_rows) * metadata["ypixelsize"]
+    if metadata["yorigin"] == "upper":
+        y = y[::-1]
+
+    attrs = {}
+    for key in ATTRS_KEYS:
+        value = metadata[key]
+        if isinstance(value, np.ndarray) or isinstance(value, np.generic):
+            value = value.item()
+        attrs[key] = value
+
+    # the importers return the members first if the file has a member dimension
+    dims = ("t", "y", "x") if precipitation.ndim == 3 else ("member", "t", "y", "x")
+    data_vars = dict(
+        precipitation=(("run",) + dims, np.asarray(precipitation)[None]),
+        time_stamps=(("run", "t_stamp"), metadata["time_stamps"][None]),
+    )
+    for key in RUN_KEYS:
+        value = np.nan if metadata[key] is None else float(metadata[key])
+        data_vars[key] = (("run",), [value])
+
+    return xr.Dataset(
+        data_vars,
+        coords=dict(
+            x=("x", x, dict(units=metadata["cartesian_unit"])),
+            y=("y", y, dict(units=metadata["cartesian_unit"])),
+        ),
+        attrs=attrs,
+    )
+
+
+def _check_same_grid(store, ds, filename):
+    with xr.open_zarr(store) as ds_store:
+        for key in ("projection", "xpixelsize", "ypixelsize"):
+            if ds_store.attrs[key] != ds.attrs[key]:
+                raise ValueError(
+                    f"{filename} is not on the grid of {store}: {key} is "
+                    f"{ds.attrs[key]} instead of {ds_store.attrs[key]}"
+                )
+        if ds_store["precipitation"].dims != ds["precipitation"].dims:
+            raise ValueError(
+                f"{filename} has the dimensions {ds['precipitation'].dims} "
+                f"instead of {ds_store['precipitation'].dims} in {store}"
+            )
+        if "member" in ds.dims and ds_store.sizes["member"] != ds.sizes["member"]:
+            raise ValueError(
+                f"{filename} has {ds.sizes['member']} members instead of "
+                f"{ds_store.sizes['member']} in {store}"
+            )
+        for dim in ("t", "t_stamp"):
+            if ds_store.sizes[dim] != ds.sizes[dim]:
+                raise ValueError(
+                    f"{filename} has {ds.sizes[dim]} time steps instead of "
+                    f"{ds_store.sizes[dim]} in {store}"
+                )
+        for coord in ("x", "y"):
+            if ds_store.sizes[coord] != ds.sizes[coord] or not np.allclose(
+                ds_store[coord].values, ds[coord].values
+            ):
+                raise ValueError(
+                    f"{filename} is not on the grid of {store}: the {coord} "
+                    "coordinates differ"
+                )
+
+
+def main(argv=None):
+    """Convert NWP forecast runs to a Zarr store from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Convert NWP rainfall forecasts to a Zarr store."
+    )
+    parser.add_argument("importer", choices=sorted(IMPORTERS), help="file layout")
+    parser.add_argument("store", help="path of the Zarr store")
+    parser.add_argument("filenames", nargs="+", help="files of the runs")
+    parser.add_argument(
+        "--append", action="store_true", help="append the runs to the store"
+    )
+    parser.add_argument("--varname", help="name of the precipitation variable")
+    parser.add_argument("--dtype", default="float32", help="data type in the store")
+    args = parser.parse_args(argv)
+
+    kwargs = dict(dtype=args.dtype)
+    if args.varname is not None:
+        kwargs["varname"] = args.varname
+    convert_to_zarr(
+        IMPORTERS[args.importer],
+        args.filenames,
+        args.store,
+        append=args.append,
+        **kwargs,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ setup(
     ],
     description="Pysteps plugin to import a variety of NWP rainfall forecasts",
     install_requires=requirements,
+    extras_require={"regrid": ["pyproj", "scipy"], "zarr": ["zarr"]},
     license="BSD license",
     long_description=readme,
     test_suite="tests",
@@ -35,7 +36,11 @@ setup(
             "import_knmi_nwp=pysteps_nwp_importers.importer_knmi_nwp:import_knmi_nwp",
             "import_bom_nwp=pysteps_nwp_importers.importer_bom_nwp:import_bom_nwp",
             "import_rmi_nwp=pysteps_nwp_importers.importer_rmi_nwp:import_rmi_nwp",
-        ]
+            "import_zarr_nwp=pysteps_nwp_importers.importer_zarr_nwp:import_zarr_nwp",
+        ],
+        "console_scripts": [
+            "pysteps-nwp-to-zarr=pysteps_nwp_importers.zarr_converter:main",
+        ],
     },
     version="0.1",
     zip_safe=False,